@@ -1,3 +1,17 @@
 from .version import __version__
-from .rel import override, supported_methods, initialize, set_verbose, set_sleep, set_turbo, safe_read, read, write, timeout, signal, error, event, dispatch, pause, resume, loop, report, is_running, abort, abort_branch, thread, tick, init, start, stop, EV_PERSIST, EV_READ, EV_SIGNAL, EV_TIMEOUT, EV_WRITE
-from .buff import buffwrite, release_buff
\ No newline at end of file
+from .rel import override, supported_methods, initialize, set_verbose, set_sleep, set_turbo, set_virtual, clock, safe_read, read, write, timeout, call_soon, idle, wheel, bucket, limit, signal, error, event, dispatch, pause, resume, loop, report, is_running, abort, drain, abort_branch, thread, tick, init, start, stop, EV_PERSIST, EV_READ, EV_SIGNAL, EV_TIMEOUT, EV_WRITE
+
+lazy = { # loaded on first use -- see __getattr__()
+    "buffwrite": "buff",
+    "release_buff": "buff",
+    "listen_accept": "net",
+    "connect": "net",
+    "spawn_process": "process",
+    "spawn_task": "task"
+}
+
+def __getattr__(name):
+    if name not in lazy:
+        raise AttributeError("module 'rel' has no attribute '%s'"%(name,))
+    from importlib import import_module
+    return getattr(import_module("." + lazy[name], __name__), name)
\ No newline at end of file
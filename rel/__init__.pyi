@@ -1,2 +1,8 @@
+from _typeshed import Incomplete
 from .buff import buffwrite as buffwrite
-from .rel import EV_PERSIST as EV_PERSIST, EV_READ as EV_READ, EV_SIGNAL as EV_SIGNAL, EV_TIMEOUT as EV_TIMEOUT, EV_WRITE as EV_WRITE, abort as abort, abort_branch as abort_branch, dispatch as dispatch, error as error, event as event, init as init, initialize as initialize, is_running as is_running, loop as loop, override as override, read as read, report as report, safe_read as safe_read, set_sleep as set_sleep, set_turbo as set_turbo, set_verbose as set_verbose, signal as signal, start as start, stop as stop, supported_methods as supported_methods, thread as thread, tick as tick, timeout as timeout, write as write
+from .rel import EV_PERSIST as EV_PERSIST, EV_READ as EV_READ, EV_SIGNAL as EV_SIGNAL, EV_TIMEOUT as EV_TIMEOUT, EV_WRITE as EV_WRITE, abort as abort, drain as drain, abort_branch as abort_branch, dispatch as dispatch, error as error, event as event, init as init, initialize as initialize, is_running as is_running, loop as loop, override as override, read as read, report as report, safe_read as safe_read, set_sleep as set_sleep, set_turbo as set_turbo, set_virtual as set_virtual, clock as clock, set_verbose as set_verbose, signal as signal, start as start, stop as stop, supported_methods as supported_methods, thread as thread, tick as tick, timeout as timeout, call_soon as call_soon, idle as idle, wheel as wheel, bucket as bucket, limit as limit, write as write
+from .net import connect as connect, listen_accept as listen_accept
+from .process import spawn_process as spawn_process
+from .task import spawn_task as spawn_task
+
+lazy: Incomplete
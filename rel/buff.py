@@ -1,11 +1,30 @@
 """
 This module has a BuffWriter and a convenience function, buffwrite().
+
+A BuffWriter's flushes can be rate limited with token buckets (see
+listener.Bucket) via throttle_buff(sock, *buckets) -- the write event
+is suspended whenever a bucket runs dry.
+
+BuffWriters also handle ssl.SSLSockets: a chunk that hits
+SSLWantWriteError is retried as-is on the next writability, and on
+SSLWantReadError the write event waits for readability instead. A
+partial send() keeps the rest of the chunk for next time.
+
+The writings registry cleans up after itself. Sent chunks are dropped
+as they go, and a BuffWriter with nothing queued unregisters its
+events and lets go of its socket until the next buffwrite(). Writers
+are released on error, and writings holds its sockets weakly, so an
+idle writer goes away with its socket (no scanning involved). With
+set_weak(False), sockets are held strongly instead, and sweep()
+releases the writers of those that have since been closed.
 """
 
+import os, socket, weakref
 from .rel import read, write, error, log
+from . import listener
 
 WMAX = 4096
-writings = {}
+writings = weakref.WeakKeyDictionary() # see set_weak()
 
 class BuffWrite(object):
 	def __init__(self, data, sender):
@@ -13,6 +32,7 @@ class BuffWrite(object):
 		self.sender = sender
 		self.complete = False
 		self.error = None
+		self.want = None
 		self.ingest(data)
 		self.reset()
 
@@ -22,21 +42,39 @@ class BuffWrite(object):
 	def reset(self):
 		self.position = 0
 
-	def write(self, sock):
+	def write(self, sock, limit=WMAX):
 		dlen = len(self.data)
 		if self.position >= dlen:
 			self.log("aborting! position %s >= len(data) dlen: %s (how?)"%(self.position, dlen))
 			self.position = dlen
+			chunk = b""
 		else:
+			chunk = self.data[self.position]
+			piece = chunk[:limit] # no more than the buckets hold
 			try:
-				self.sender(sock, self.data[self.position])
+				sent = self.sender(sock, piece)
+			except (BlockingIOError, listener.SSLWantWriteError): # same chunk again, once writable
+				return 0
+			except listener.SSLWantReadError:
+				self.want = "read"
+				return 0
 			except Exception as e:
 				self.error = e
 				return self.reset()
+			if type(sent) is not int: # sendall() and the like
+				sent = len(piece)
+			if sent < len(chunk):
+				self.data[self.position] = chunk[sent:]
+				return sent
+			self.data[self.position] = None # sent -- don't hold on to it
 			self.position += 1
 		if self.position == dlen:
 			self.complete = True
 			self.log("write complete")
+		return len(chunk)
+
+	def remaining(self):
+		return sum([len(chunk) for chunk in self.data[self.position:]])
 
 	def ingest(self, data):
 		ld = len(data)
@@ -49,20 +87,21 @@ class BuffWriter(object):
 	def __init__(self, sock, data, sender=None, onerror=None):
 		self.writes = []
 		self.errors = []
-		self.sock = sock
+		self.onflush = []
+		self.buckets = []
+		self.listeners = {}
+		self.sock = None
 		self.fileno = sock.fileno()
-		self.sender = sender or sock.send
-		if not onerror:
-			onerror = lambda *a : self.log("unhandled error:", *a)
-		self.onerror = onerror
-		self.listen()
-		self.ingest(data)
+		self.sender = sender or (lambda sock, data : sock.send(data))
+		self.onerror = onerror # (no default closing over self -- see set_weak())
+		self.ingest(data, sock)
 		self.log("initialized with %s-byte message"%(len(data),))
 
 	def log(self, *msg):
 		log("BuffWriter[%s]: %s"%(self.fileno, " ".join(msg)))
 
 	def error(self, msg=None):
+		sock = self.sock # onerror may well release_buff() it
 		if msg is None:
 			msg = "unexpected error"
 			# Try to extract the error from the socket
@@ -72,50 +111,131 @@ class BuffWriter(object):
 					msg = os.strerror(err)
 			except Exception:
 				pass
-		self.onerror(msg)
+		if self.onerror:
+			self.onerror(msg)
+		else:
+			self.log("unhandled error:", msg)
 		self.errors.append(msg)
 		self.log("error #%s: %s"%(len(self.errors), msg))
+		if writings.get(sock) is self: # nothing more is getting through
+			release_buff(sock)
 
 	def write(self):
 		if self.writes:
+			event = self.listeners["write"]
 			bw = self.writes[0]
-			bw.write(self.sock)
+			sent = bw.write(self.sock, event.grant(WMAX))
 			if bw.error:
 				return self.error("write error: %s"%(bw.error,))
+			if bw.want:
+				bw.want = None
+				event.want("read")
+			event.charge(sent)
+			event.registrar.tracer and event.registrar.tracer.flush(self.fileno, sent)
 			bw.complete and self.writes.pop(0)
-			self.writes or self.log("all writes complete")
+			self.writes or self.flushed()
 		else:
 			self.log("unexpected empty write()!")
 		return self.writes
 
+	def queued(self):
+		return sum([bw.remaining() for bw in self.writes])
+
+	def flushed(self):
+		self.log("all writes complete")
+		self.idle()
+		onflush, self.onflush = self.onflush, []
+		for cb in onflush:
+			cb()
+
+	def throttle(self, *buckets):
+		self.buckets = buckets
+		if self.listeners:
+			self.listeners["write"].throttle(*buckets)
+
 	def listen(self):
 		self.log("listening")
 		self.listeners = {
 			"error": error(self.sock, self.error),
 			"write": write(self.sock, self.write)
 		}
+		self.listeners["write"].meter()
+		self.buckets and self.listeners["write"].throttle(*self.buckets)
 
-	def ingest(self, data):
+	def ingest(self, data, sock):
 		self.log("ingesting %s bytes"%(len(data),))
 		self.writes.append(BuffWrite(data, self.sender))
+		if self.listeners:
+			for event in self.listeners.values():
+				event.pending() or event.add()
+		else:
+			self.sock = sock
+			self.listen()
+
+	def idle(self): # until the next ingest(), hold nothing -- not even the socket
 		for event in self.listeners.values():
-			event.pending() or event.add()
+			event.dereference() # no SocketIO-Timer cycle keeping us around
+		self.listeners = {}
+		self.sock = None
 
 	def release(self):
 		self.log("release")
 		self.writes = []
 		self.errors = []
-		for event in self.listeners.values():
-			event.delete()
-		self.listeners = {}
+		self.onflush = []
+		self.idle()
+
+def closed(sock):
+	try:
+		return sock.fileno() < 0
+	except (OSError, ValueError): # closed file object
+		return True
+
+def sweep():
+	'''
+	Release the BuffWriters of sockets that have since been closed.
+	'''
+	for sock in [sock for sock in list(writings.keys()) if closed(sock)]:
+		release_buff(sock)
+
+def set_weak(weak=True):
+	'''
+	Hold buffwrite()ing sockets weakly (the default), or strongly, if weak is False.
+	'''
+	global writings
+	writings = (weak and weakref.WeakKeyDictionary or dict)(writings)
 
 def buffwrite(sock, data, sender, onerror):
 	writer = writings.get(sock)
 	if writer is not None:
-		writer.ingest(data)
+		writer.ingest(data, sock)
 	else:
 		writings[sock] = BuffWriter(sock, data, sender, onerror)
 
+def throttle_buff(sock, *buckets):
+	'''
+	Rate limit the BuffWriter associated with the given socket.
+	'''
+	writer = writings.get(sock)
+	if writer is not None:
+		writer.throttle(*buckets)
+
+def when_flushed(sock, cb):
+	'''
+	Call cb() once the given socket's BuffWriter (if any) has nothing left to send.
+	'''
+	writer = writings.get(sock)
+	if writer is not None and writer.writes:
+		writer.onflush.append(cb)
+	else:
+		cb()
+
+def queued():
+	'''
+	Map each buffwrite()ing socket's fileno to its unsent byte count.
+	'''
+	return dict([(writer.fileno, writer.queued()) for writer in writings.values()])
+
 def release_buff(sock):
 	'''
 	Release the resources from the BuffWriter associated with the given socket.
@@ -1,3 +1,4 @@
+from . import listener as listener
 from .rel import error as error, log as log, read as read, write as write
 from _typeshed import Incomplete
 
@@ -9,16 +10,21 @@ class BuffWrite:
     sender: Incomplete
     complete: bool
     error: Incomplete
+    want: Incomplete
     def __init__(self, data, sender) -> None: ...
     def log(self, *msg) -> None: ...
     position: int
     def reset(self) -> None: ...
-    def write(self, sock): ...
+    def write(self, sock, limit=...): ...
+    def remaining(self): ...
     def ingest(self, data) -> None: ...
 
 class BuffWriter:
     writes: Incomplete
     errors: Incomplete
+    onflush: Incomplete
+    buckets: Incomplete
+    listeners: Incomplete
     sock: Incomplete
     fileno: Incomplete
     sender: Incomplete
@@ -27,8 +33,19 @@ class BuffWriter:
     def log(self, *msg) -> None: ...
     def error(self, msg: str = ...) -> None: ...
     def write(self): ...
-    listeners: Incomplete
+    def queued(self): ...
+    def flushed(self) -> None: ...
+    def throttle(self, *buckets) -> None: ...
     def listen(self) -> None: ...
-    def ingest(self, data) -> None: ...
+    def ingest(self, data, sock) -> None: ...
+    def idle(self) -> None: ...
+    def release(self) -> None: ...
 
+def closed(sock): ...
+def sweep() -> None: ...
+def set_weak(weak: bool = ...) -> None: ...
 def buffwrite(sock, data, sender, onerror) -> None: ...
+def throttle_buff(sock, *buckets) -> None: ...
+def when_flushed(sock, cb) -> None: ...
+def queued(): ...
+def release_buff(sock) -> None: ...
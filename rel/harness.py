@@ -0,0 +1,114 @@
+"""
+This module contains a virtual-time test harness: SocketPair and Harness.
+
+### SocketPair
+This class wraps a non-blocking socket.socketpair(). The local end is
+meant to be registered with rel (read(), write(), buffwrite(), etc),
+while the remote end plays the peer:
+
+    pair = SocketPair()
+    rel.read(pair.local, on_read)
+    pair.send(b"hello")
+
+### Harness
+This class switches rel to virtual time (see registrar.set_virtual())
+and drives the loop directly, so timer-heavy code runs instantly while
+still going through real Registrar dispatch:
+
+    with Harness() as h:
+        rel.timeout(30, on_timeout)
+        pair = h.pair()
+        rel.read(pair.local, on_read)
+        pair.send(b"ping")
+        h.run(60)
+"""
+
+import socket
+from . import rel
+from .registrar import set_virtual, clock
+
+RUN_LIMIT = 100000
+
+class SocketPair(object):
+    def __init__(self):
+        self.local, self.remote = socket.socketpair()
+        self.local.setblocking(False)
+        self.remote.setblocking(False)
+
+    def fileno(self):
+        return self.local.fileno()
+
+    def send(self, data):
+        self.remote.sendall(data)
+
+    def recv(self, size=65536):
+        chunks = []
+        while True:
+            try:
+                chunk = self.remote.recv(size)
+            except (BlockingIOError, InterruptedError):
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def hangup(self):
+        self.remote.close()
+
+    def close(self):
+        self.local.close()
+        self.remote.close()
+
+class Harness(object):
+    def __init__(self):
+        self.pairs = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        set_virtual(True)
+        rel.init()
+
+    def stop(self):
+        for pair in self.pairs:
+            pair.close()
+        self.pairs = []
+        rel.init()
+        set_virtual(False)
+
+    def pair(self):
+        pair = SocketPair()
+        self.pairs.append(pair)
+        return pair
+
+    def now(self):
+        return clock()
+
+    def run(self, seconds=None, until=None):
+        """
+        Drive the loop until the until() predicate returns True,
+        seconds of virtual time have elapsed, or nothing is left
+        to wait for. Returns the virtual time that passed.
+        """
+        rel.check_init()
+        start = clock()
+        deadline = None
+        if seconds is not None:
+            deadline = start + seconds
+            stopper = rel.timeout(seconds, lambda : None)
+        for i in range(RUN_LIMIT):
+            if until and until():
+                break
+            if deadline is not None and clock() >= deadline:
+                break
+            if not rel.registrar.loop():
+                break
+        if deadline is not None:
+            stopper.delete()
+        return clock() - start
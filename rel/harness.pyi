@@ -0,0 +1,26 @@
+from . import rel as rel
+from .registrar import clock as clock, set_virtual as set_virtual
+from _typeshed import Incomplete
+
+RUN_LIMIT: int
+
+class SocketPair:
+    local: Incomplete
+    remote: Incomplete
+    def __init__(self) -> None: ...
+    def fileno(self): ...
+    def send(self, data) -> None: ...
+    def recv(self, size: int = ...): ...
+    def hangup(self) -> None: ...
+    def close(self) -> None: ...
+
+class Harness:
+    pairs: Incomplete
+    def __init__(self) -> None: ...
+    def __enter__(self): ...
+    def __exit__(self, *args) -> None: ...
+    def start(self) -> None: ...
+    def stop(self) -> None: ...
+    def pair(self): ...
+    def now(self): ...
+    def run(self, seconds: Incomplete | None = ..., until: Incomplete | None = ...): ...
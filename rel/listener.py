@@ -7,7 +7,40 @@ signal, and timeout events.
 
 ### SocketIO
 This class uses a Registrar subclass instance to manage read, and
-write events.
+write events. A read SocketIO can be put in drain mode:
+
+    read(sock, on_data, drain=DRAIN_BUDGET)
+
+Each readiness notification then recv()s until the socket would block
+(or budget bytes have been read), and calls on_data(data, *args) once
+with everything. data is b"" on EOF (or a connection error), and None
+if nothing could be read (say, when a timeout fired).
+
+An ssl.SSLSocket (with do_handshake_on_connect=False -- see the tls
+module) can be used like any other socket. Decrypted bytes waiting in
+sock.pending() get another callback on the next pass, without waiting
+for the poller (which can't see them), and when TLS needs the other
+direction (SSLWantWriteError on a read, say), the SocketIO sits out
+until the socket is ready for that instead (riding along on the other
+direction's SocketIO, if there already is one).
+
+### Bucket
+This class is a token bucket (rate bytes per second, holding up to
+burst bytes) for rate limiting SocketIOs:
+
+    sockio.throttle(Bucket(registrar, 65536))
+
+A throttled SocketIO is charge()d for the bytes it moves -- drain mode
+reads and buffwrite() flushes do this automatically, and also never
+take more than the buckets hold. Once a bucket runs dry, the SocketIO
+is unregistered (no spinning), and a Timer re-registers it when the
+bucket has refilled. A Bucket may be shared (say, per tenant), and
+a registrar-wide Bucket per event type can be set with rel.limit().
+
+Only metered SocketIOs -- drain mode ones, and those whose callback
+charge()s for itself and says so with meter() -- are limited: a plain
+callback's bytes are never seen, so throttle() refuses it (ValueError),
+and rel.limit() leaves it be.
 
 ### Signal
 This class uses the signal library and a Registrar subclass instance
@@ -15,23 +48,56 @@ to manage signal events.
 
 ### Timer
 This class uses a Registrar subclass to manage timer events.
+Timers that don't need exact deadlines can be given some slack:
+
+    Timer(registrar, 30, heartbeat, slack=1)
+
+The expiration is then rounded up to a multiple of slack seconds,
+so timers with nearby deadlines share an expiration and are fired
+together in a single pass of check_timers().
+
+### Idle Timeouts
+Event and SocketIO objects can hand their inactivity timeout to a
+shared Wheel (see the wheel module) instead of a Timer of their own:
+
+    ev.watch(wheel, on_idle, *args)
+
+Every add() and dispatch then touches the Wheel, and delete() drops
+the object from it.
 """
 
-import time, signal
+import os, sys, time, signal, math
 from .util import Basic
 
+class NoSSL(Exception): # stands in for ssl's classes until ssl is imported (see is_tls())
+    pass
+
+SSLSocket = SSLWantReadError = SSLWantWriteError = NoSSL
+
 EV_PERSIST = 16
 EV_READ = 2
 EV_SIGNAL = 8
 EV_TIMEOUT = 1
 EV_WRITE = 4
+DRAIN_BUDGET = 262144
+DRAIN_CHUNK = 65536
+BUCKET_GRAIN = 0.01
 noadd = "this is a do-not-add order from your mother, an Event object"
 
+def is_tls(sock):
+    global SSLSocket, SSLWantReadError, SSLWantWriteError
+    ssl = sys.modules.get("ssl")
+    if ssl is None: # no ssl, no SSLSockets -- and no importing it for nothing
+        return False
+    if SSLSocket is NoSSL:
+        SSLSocket, SSLWantReadError, SSLWantWriteError = ssl.SSLSocket, ssl.SSLWantReadError, ssl.SSLWantWriteError
+    return isinstance(sock, SSLSocket)
+
 def contains(mode,bit):
     return mode&bit==bit
 
 class Event(object):
-    def __init__(self,registrar,cb,arg,evtype,handle):
+    def __init__(self,registrar,cb,arg,evtype,handle,priority=0):
         self.registrar = registrar
         self.cb = cb
         self.arg = arg
@@ -39,7 +105,9 @@ class Event(object):
         self.evtype = evtype or 1
         self.handle = handle
         self.children = []
+        self.wheel = None
         self.spawn_children()
+        self.set_priority(priority)
 
     def spawn_children(self):
         persist = contains(self.evtype,EV_PERSIST)
@@ -61,11 +129,29 @@ class Event(object):
             self.timeout.add(delay)
         for child in self.children:
             child.add()
+        self.touch()
+
+    def set_priority(self, priority):
+        self.priority = priority
+        self.timeout.set_priority(priority)
+        for child in self.children:
+            child.set_priority(priority)
 
     def delete(self):
         self.timeout.delete()
         for child in self.children:
             child.delete()
+        if self.wheel is not None:
+            self.wheel.remove(self)
+
+    def watch(self, wheel, cb=None, *args):
+        self.wheel = wheel
+        self.onidle = [cb or self.callback, args]
+        self.touch()
+
+    def touch(self):
+        if self.wheel is not None:
+            self.wheel.touch(self, self.onidle[0], *self.onidle[1])
 
     def pending(self):
         for child in self.children:
@@ -74,10 +160,11 @@ class Event(object):
         return self.timeout.pending()
 
     def callback(self):
+        self.touch()
         self.cb(self,self.handle,self.evtype,self.arg)
 
 class SocketIO(Basic):
-    def __init__(self, registrar, evtype, sock, cb, *args):
+    def __init__(self, registrar, evtype, sock, cb, *args, priority=0, drain=0):
         self.registrar = registrar
         self.evtype = evtype
         self.sock = sock
@@ -89,6 +176,17 @@ class SocketIO(Basic):
         self.args = args
         self.persist = False
         self.active = 0
+        self.wheel = None
+        self.budget = 0
+        self.metered = False
+        self.buckets = []
+        self.suspended = False
+        self.resumption = None
+        self.followup = None
+        self.riders = None
+        self.tls = is_tls(sock)
+        self.set_priority(priority)
+        drain and self.drain(drain)
         if noadd in self.args:
             self.args = ()
             return
@@ -104,17 +202,149 @@ class SocketIO(Basic):
     def persistent(self):
         self.persist = True
 
+    def meter(self): # the callback charge()s for itself
+        self.metered = True
+
+    def drain(self, budget=DRAIN_BUDGET):
+        self.budget = budget
+        self.metered = True
+        if hasattr(self.sock, "recv"):
+            self.sock.setblocking(False)
+            self.receive = self.sock.recv
+        else:
+            os.set_blocking(self.fd, False)
+            self.receive = lambda size : os.read(self.fd, size)
+
+    def slurp(self, budget):
+        chunks = []
+        total = 0
+        while total < budget:
+            try:
+                chunk = self.receive(min(DRAIN_CHUNK, budget - total))
+            except (BlockingIOError, InterruptedError, SSLWantReadError):
+                break
+            except SSLWantWriteError: # renegotiation
+                self.want("write")
+                break
+            except OSError as e:
+                self.log("drain error:", e)
+                chunk = b""
+            if not chunk:
+                if not chunks:
+                    return b""
+                break # EOF shows up again next time
+            chunks.append(chunk)
+            total += len(chunk)
+        return chunks and b"".join(chunks) or None
+
+    def set_priority(self, priority):
+        self.priority = priority
+        if priority:
+            self.registrar.prioritized = True
+
+    def throttle(self, *buckets):
+        if buckets and not self.metered:
+            raise ValueError("can't throttle an unmetered SocketIO -- use drain mode, or charge() and meter()")
+        self.buckets = list(buckets)
+
+    def limits(self):
+        shared = self.registrar.limits.get(self.evtype)
+        if shared:
+            return self.buckets + [shared]
+        return self.buckets
+
+    def grant(self, budget):
+        for bucket in self.limits():
+            budget = min(budget, int(bucket.refill()))
+        return budget
+
+    def charge(self, nbytes):
+        for bucket in self.limits():
+            bucket.take(nbytes)
+
+    def throttled(self):
+        wait = 0
+        for bucket in self.limits():
+            wait = max(wait, bucket.wait())
+        if wait:
+            self.suspend(wait)
+        return wait
+
+    def hold(self): # unregistered until resume()
+        self.log("hold")
+        if not self.suspended:
+            self.suspended = True
+            self.registrar.remove(self)
+
+    def suspend(self, wait):
+        self.log("suspend for", wait)
+        self.hold()
+        if self.resumption is None:
+            self.resumption = self.registrar.timeout(None, self.resume)
+        self.resumption.add(wait)
+
+    def resume(self):
+        self.log("resume")
+        self.suspended = False
+        self.active and self.registrar.add(self)
+        self.tls and self.chase()
+
+    def chase(self): # the poller can't see decrypted bytes -- go again next pass
+        if self.active and not self.suspended and self.evtype == "read" and self.sock.pending():
+            if self.followup is None:
+                self.followup = self.registrar.timeout(None, self.callback)
+            self.followup.add(0)
+
+    def want(self, evtype):
+        self.log("TLS wants", evtype)
+        self.hold()
+        other = self.registrar.events[evtype].get(self.fd)
+        if other is None:
+            SocketIO(self.registrar, evtype, self.sock, self.wanted)
+        else: # that direction is spoken for -- ride along on its next event
+            other.riders = other.riders or []
+            other.riders.append(self.wanted)
+
+    def unload(self): # riders first: they were waiting on this very event
+        riders, self.riders = self.riders, None
+        for rider in riders or ():
+            rider()
+
+    def wanted(self):
+        self.resume()
+        self.active and self.callback()
+
     def add(self, delay=None):
         self.log("add w/ delay =", delay)
+        if self.evtype == "read" and self.registrar.draining:
+            return self.log("draining -- not reading")
         if delay is not None:
             self.timeout.add(delay)
-        self.registrar.add(self)
+        self.suspended or self.registrar.add(self)
         self.active = 1
+        self.touch()
 
     def delete(self):
         self.log("delete")
+        if self.suspended:
+            self.suspended = False
+            self.resumption and self.resumption.delete()
+        self.followup and self.followup.delete()
         self.registrar.remove(self)
         self.active = 0
+        if self.riders: # no event coming -- let them try again (and want() anew)
+            self.registrar.timeout(0, self.unload)
+        if self.wheel is not None:
+            self.wheel.remove(self)
+
+    def watch(self, wheel, cb=None, *args):
+        self.wheel = wheel
+        self.onidle = [cb or self.callback, args]
+        self.touch()
+
+    def touch(self):
+        if self.wheel is not None:
+            self.wheel.touch(self, self.onidle[0], *self.onidle[1])
 
     def dereference(self):
         self.log("deference")
@@ -122,14 +352,57 @@ class SocketIO(Basic):
             self.delete()
         self.cb = None
         self.args = None
+        self.wheel = None
         self.timeout.delete(True)
 
     def pending(self):
         return self.active
 
     def callback(self):
-        if not self.cb(*self.args) and not self.persist and self.active:
+        self.touch()
+        self.riders and self.unload()
+        limited = self.metered and (self.buckets or self.registrar.limits)
+        if limited and self.throttled():
+            return
+        if self.budget:
+            data = self.slurp(limited and self.grant(self.budget) or self.budget)
+            limited and data and self.charge(len(data))
+            result = self.cb(data, *self.args)
+        else:
+            result = self.cb(*self.args)
+        if not result and not self.persist and self.active:
             self.delete()
+        elif limited and self.active:
+            self.throttled()
+        self.tls and self.chase()
+
+class Bucket(object):
+    def __init__(self, registrar, rate, burst=None):
+        self.registrar = registrar
+        self.rate = rate
+        self.capacity = burst or rate
+        self.minimum = min(self.capacity, max(1, rate * BUCKET_GRAIN))
+        self.tokens = self.capacity
+        self.stamp = self.registrar.now()
+
+    def __repr__(self):
+        return '<Bucket Object | Rate:"%s">'%(self.rate,)
+
+    def refill(self):
+        now = self.registrar.now()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return self.tokens
+
+    def take(self, nbytes):
+        self.refill()
+        self.tokens -= nbytes
+
+    def wait(self):
+        tokens = self.refill()
+        if tokens >= 1:
+            return 0
+        return (self.minimum - tokens) / self.rate # refill a useful amount
 
 class Signal(object):
     def __init__(self, registrar, sig, cb, *args):
@@ -138,6 +411,7 @@ class Signal(object):
         self.default = signal.getsignal(self.sig)
         self.cb = cb
         self.args = args
+        self.priority = 0
         if noadd in self.args:
             self.args = ()
             return
@@ -165,6 +439,9 @@ class Signal(object):
     def reset(self):
         signal.signal(self.sig,self.default)
 
+    def set_priority(self, priority):
+        self.priority = priority # recorded only -- signal callbacks run from the handler
+
     def pending(self):
         return self.active
 
@@ -173,10 +450,14 @@ class Signal(object):
         self.registrar.error_check = True
 
 class Timer(object):
-    def __init__(self, registrar, delay, cb, *args):
+    def __init__(self, registrar, delay, cb, *args, slack=0, priority=0):
         self.registrar = registrar
         self.cb = cb
         self.args = args
+        self.slack = slack
+        self.expiration = None
+        self.entry = None
+        self.set_priority(priority)
         if noadd in self.args:
             self.args = ()
             return
@@ -188,12 +469,24 @@ class Timer(object):
             cbname = self.cb.__self__.__class__.__name__ + "." + cbname
         return '<Timer Object | Callback:"%s">'%cbname
 
-    def add(self, delay=None):
+    def add(self, delay=None, slack=None):
+        if slack is not None:
+            self.slack = slack
+        pending = self.pending()
         self.delay = delay
         self.expiration = None
         if self.delay is not None:
-            self.expiration = time.monotonic()+self.delay
+            self.expiration = self.registrar.now()+self.delay
+            if self.slack: # round up to the slack grid so nearby timers fire together
+                self.expiration = math.ceil(self.expiration / self.slack) * self.slack
             self.registrar.add_timer(self)
+        elif pending:
+            self.registrar.remove_timer(self)
+
+    def set_priority(self, priority):
+        self.priority = priority
+        if priority:
+            self.registrar.prioritized = True
 
     def delete(self, dereference=False):
         self.expiration = None
@@ -210,7 +503,7 @@ class Timer(object):
     def check(self, t=None):
         if not self.pending():
             return False
-        if (t or time.monotonic()) >= self.expiration:
+        if (t or self.registrar.now()) >= self.expiration:
             if self.cb(*self.args):
                 self.add(self.delay)
                 return True
@@ -5,8 +5,17 @@ EV_READ: int
 EV_SIGNAL: int
 EV_TIMEOUT: int
 EV_WRITE: int
+DRAIN_BUDGET: int
+DRAIN_CHUNK: int
+BUCKET_GRAIN: float
 noadd: str
+class NoSSL(Exception): ...
 
+SSLSocket: Incomplete
+SSLWantReadError: Incomplete
+SSLWantWriteError: Incomplete
+
+def is_tls(sock): ...
 def contains(mode, bit): ...
 
 class Event:
@@ -17,10 +26,16 @@ class Event:
     evtype: Incomplete
     handle: Incomplete
     children: Incomplete
-    def __init__(self, registrar, cb, arg, evtype, handle) -> None: ...
+    wheel: Incomplete
+    def __init__(self, registrar, cb, arg, evtype, handle, priority: int = ...) -> None: ...
     def spawn_children(self) -> None: ...
     def add(self, delay: Incomplete | None = ...) -> None: ...
+    priority: Incomplete
+    def set_priority(self, priority) -> None: ...
     def delete(self) -> None: ...
+    onidle: Incomplete
+    def watch(self, wheel, cb: Incomplete | None = ..., *args) -> None: ...
+    def touch(self) -> None: ...
     def pending(self): ...
     def callback(self) -> None: ...
 
@@ -33,15 +48,57 @@ class SocketIO:
     args: Incomplete
     persist: bool
     active: int
+    wheel: Incomplete
     timeout: Incomplete
-    def __init__(self, registrar, evtype, sock, cb, *args) -> None: ...
+    budget: int
+    metered: bool
+    buckets: Incomplete
+    suspended: bool
+    resumption: Incomplete
+    followup: Incomplete
+    riders: Incomplete
+    tls: Incomplete
+    def __init__(self, registrar, evtype, sock, cb, *args, priority: int = ..., drain: int = ...) -> None: ...
     def persistent(self) -> None: ...
+    def meter(self) -> None: ...
+    receive: Incomplete
+    def drain(self, budget=...) -> None: ...
+    def slurp(self, budget): ...
+    priority: Incomplete
+    def set_priority(self, priority) -> None: ...
+    def throttle(self, *buckets) -> None: ...
+    def limits(self): ...
+    def grant(self, budget): ...
+    def charge(self, nbytes) -> None: ...
+    def throttled(self): ...
+    def hold(self) -> None: ...
+    def suspend(self, wait) -> None: ...
+    def resume(self) -> None: ...
+    def chase(self) -> None: ...
+    def want(self, evtype) -> None: ...
+    def wanted(self) -> None: ...
+    def unload(self) -> None: ...
     def add(self, delay: Incomplete | None = ...) -> None: ...
     def delete(self) -> None: ...
+    onidle: Incomplete
+    def watch(self, wheel, cb: Incomplete | None = ..., *args) -> None: ...
+    def touch(self) -> None: ...
     def dereference(self) -> None: ...
     def pending(self): ...
     def callback(self) -> None: ...
 
+class Bucket:
+    registrar: Incomplete
+    rate: Incomplete
+    capacity: Incomplete
+    minimum: Incomplete
+    tokens: Incomplete
+    stamp: Incomplete
+    def __init__(self, registrar, rate, burst: Incomplete | None = ...) -> None: ...
+    def refill(self): ...
+    def take(self, nbytes) -> None: ...
+    def wait(self): ...
+
 class Signal:
     registrar: Incomplete
     sig: Incomplete
@@ -54,6 +111,8 @@ class Signal:
     def add(self, delay: Incomplete | None = ...) -> None: ...
     def delete(self) -> None: ...
     def reset(self) -> None: ...
+    priority: Incomplete
+    def set_priority(self, priority) -> None: ...
     def pending(self): ...
     def callback(self, *args) -> None: ...
 
@@ -61,10 +120,14 @@ class Timer:
     registrar: Incomplete
     cb: Incomplete
     args: Incomplete
-    def __init__(self, registrar, delay, cb, *args) -> None: ...
-    delay: Incomplete
+    slack: Incomplete
     expiration: Incomplete
-    def add(self, delay: Incomplete | None = ...) -> None: ...
+    entry: Incomplete
+    def __init__(self, registrar, delay, cb, *args, slack: int = ..., priority: int = ...) -> None: ...
+    delay: Incomplete
+    def add(self, delay: Incomplete | None = ..., slack: Incomplete | None = ...) -> None: ...
+    priority: Incomplete
+    def set_priority(self, priority) -> None: ...
     def delete(self, dereference: bool = ...) -> None: ...
     def pending(self): ...
     def check(self, t: Incomplete | None = ...): ...
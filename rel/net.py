@@ -0,0 +1,377 @@
+"""
+This module contains network helpers built on the rel API.
+
+### Acceptor
+This class drains a listening socket's backlog in batches. Each time
+the socket is readable, accept() is called until it would block (or
+the batch budget is spent), and on_conn(conn, addr, *args) is called
+with each new (non-blocking) connection, so a connection storm is
+accepted in a handful of dispatches instead of one per connection:
+
+    def on_conn(conn, addr):
+        rel.read(conn, on_data, conn)
+
+    listen_accept(server_sock, on_conn, batch=64)
+
+### Datagram
+This class is a UDP fast path. When the socket is readable, up to
+batch datagrams are received (via recvfrom_into()) into a reused pool
+of buffers (allocated as bursts need them, one per datagram in a pass),
+and on_packet(view, addr, *args) is called for each. The memoryview is
+only valid until the socket is next read, so copy it (bytes(view)) to
+keep it past the callback. Outgoing datagrams are
+queued by sendto() and flushed on writability. Each destination may
+have at most dest_max datagrams queued (and the whole queue, qmax):
+past that, sendto() drops the datagram, counts it, and returns False.
+
+    dgram = Datagram(sock, on_packet)
+    dgram.sendto(b"pong", addr)
+
+### connect(addr, on_connected, on_error=None, timeout=CONNECT_TIMEOUT, *args)
+This function opens an outbound TCP (or, for a path, Unix) connection
+without blocking. The connect() is started on a non-blocking socket,
+and its outcome is read (SO_ERROR) once the socket is writable. Then
+on_connected(sock, *args) is called, or on_error(error, *args) if it
+failed or took longer than timeout seconds (a TimeoutError). Hostnames
+are resolved by connect() itself, which blocks, so give it an address.
+A Unix socket with a full backlog fails right away (EAGAIN), rather
+than waiting for room. cancel() gives up, calling neither callback.
+
+### Pool
+This class keeps connections to upstreams around between requests,
+keyed by address, so a fan-out doesn't connect (and close) every time:
+
+    pool = Pool(max_per_host=8)
+
+    def on_conn(sock):
+        buffwrite(sock, request, None, None)
+        ... # once the response is in
+        pool.release(addr, sock) # or pool.discard(addr, sock), if it's spoiled
+
+    pool.acquire(addr, on_conn, on_error)
+
+acquire() hands out an idle connection if there is a healthy one,
+connects if the address has fewer than max_per_host, and otherwise
+queues the request until one is released or discarded. Idle
+connections are watched for readability (the peer hanging up, or
+sending something nobody asked for) and dropped, as they are after
+idle seconds without use. A check(sock) callback may also be given,
+for a protocol-level health check on the way out. close() closes the
+idle connections, cancels those still connecting, and calls on_error()
+(with a ConnectionAbortedError) for every request that was waiting.
+"""
+
+import errno, socket
+from collections import deque
+from . import rel
+from .rel import read, write, error, call_soon
+from .util import Basic
+
+ACCEPT_BATCH = 64
+ACCEPT_STOP = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+DGRAM_BATCH = 64
+DGRAM_SIZE = 65535
+DGRAM_QMAX = 65536
+DGRAM_DEST_MAX = 1024
+CONNECT_TIMEOUT = 10
+CONNECT_PENDING = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN)
+CONNECT_PENDING_UNIX = (errno.EINPROGRESS,) # EAGAIN there means the backlog is full
+POOL_MAX = 8
+POOL_IDLE = 60
+
+class Acceptor(Basic):
+    def __init__(self, sock, on_conn, batch=ACCEPT_BATCH, *args):
+        self.sock = sock
+        self.on_conn = on_conn
+        self.batch = batch
+        self.args = args
+        self.accepted = 0
+        self.subname = sock.fileno()
+        self.sock.setblocking(False)
+        self.listener = read(self.sock, self.accept)
+        self.listener.persistent()
+
+    def accept(self):
+        for i in range(self.batch):
+            try:
+                conn, addr = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                if e.errno in ACCEPT_STOP: # out of resources -- retry next tick
+                    self.log("accept failed:", e)
+                    break
+                continue # probably ECONNABORTED -- next!
+            conn.setblocking(False)
+            self.accepted += 1
+            self.on_conn(conn, addr, *self.args)
+        return True
+
+    def close(self):
+        self.listener.delete()
+
+def listen_accept(sock, on_conn, batch=ACCEPT_BATCH, *args):
+    return Acceptor(sock, on_conn, batch, *args)
+
+class Datagram(Basic):
+    def __init__(self, sock, on_packet=None, *args, batch=DGRAM_BATCH, size=DGRAM_SIZE, qmax=DGRAM_QMAX, dest_max=DGRAM_DEST_MAX):
+        self.sock = sock
+        self.on_packet = on_packet
+        self.args = args
+        self.batch = batch
+        self.size = size
+        self.qmax = qmax
+        self.dest_max = dest_max
+        self.subname = sock.fileno()
+        self.pool = []
+        self.queue = deque()
+        self.backlog = {}
+        self.drops = 0
+        self.received = 0
+        self.sent = 0
+        self.errors = 0
+        self.sock.setblocking(False)
+        self.reader = None
+        if on_packet:
+            self.reader = read(self.sock, self.receive)
+            self.reader.persistent()
+        self.writer = write(self.sock, self.flush)
+        self.writer.delete()
+
+    def receive(self):
+        pool = self.pool
+        for i in range(self.batch):
+            if i == len(pool): # grown on demand, up to batch buffers
+                pool.append(memoryview(bytearray(self.size)))
+            buf = pool[i]
+            try:
+                n, addr = self.sock.recvfrom_into(buf)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e: # ICMP errors (ECONNREFUSED etc) land here
+                self.errors += 1
+                self.log("recv error:", e)
+                continue
+            self.received += 1
+            self.on_packet(buf[:n], addr, *self.args)
+        return True
+
+    def sendto(self, payload, addr):
+        queued = self.backlog.get(addr, 0)
+        if queued >= self.dest_max or len(self.queue) >= self.qmax:
+            self.drops += 1
+            return False
+        self.backlog[addr] = queued + 1
+        self.queue.append((payload, addr))
+        self.writer.pending() or self.writer.add()
+        return True
+
+    def flush(self):
+        queue = self.queue
+        while queue:
+            payload, addr = queue[0]
+            try:
+                self.sock.sendto(payload, addr)
+                self.sent += 1
+            except (BlockingIOError, InterruptedError):
+                return True # try again when writable
+            except OSError as e:
+                self.errors += 1
+                self.log("send error:", e)
+            queue.popleft()
+            queued = self.backlog[addr] - 1
+            if queued:
+                self.backlog[addr] = queued
+            else:
+                del self.backlog[addr]
+        return False
+
+    def report(self):
+        return {
+            "received": self.received,
+            "sent": self.sent,
+            "queued": len(self.queue),
+            "errors": self.errors,
+            "drops": self.drops
+        }
+
+    def close(self):
+        self.reader and self.reader.delete()
+        self.writer.delete()
+        self.queue.clear()
+        self.backlog.clear()
+
+class Connector(Basic):
+    def __init__(self, addr, on_connected, on_error=None, timeout=CONNECT_TIMEOUT, *args):
+        self.addr = addr
+        self.on_connected = on_connected
+        self.on_error = on_error
+        self.args = args
+        self.subname = addr
+        self.listeners = []
+        self.timer = None
+        self.cancelled = False
+        pending = CONNECT_PENDING
+        if isinstance(addr, str):
+            family = socket.AF_UNIX
+            pending = CONNECT_PENDING_UNIX
+        else:
+            family = ":" in addr[0] and socket.AF_INET6 or socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.setblocking(False)
+        try:
+            err = self.sock.connect_ex(addr)
+        except OSError as e: # bad address, or a failed lookup
+            err = e
+        if err in pending:
+            self.listeners = [write(self.sock, self.check), error(self.sock, self.check)]
+            self.timer = rel.timeout(timeout, self.expire)
+        else: # done already (or failed already) -- report back from the loop, as usual
+            call_soon(self.complete, err)
+
+    def check(self):
+        self.complete(self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR))
+
+    def expire(self):
+        self.complete(TimeoutError(errno.ETIMEDOUT, "connect timed out"))
+
+    def complete(self, err):
+        if self.cancelled:
+            return
+        self.close()
+        if not err:
+            self.log("connected")
+            return self.on_connected(self.sock, *self.args)
+        if type(err) is int:
+            err = OSError(err, errno.errorcode.get(err, str(err)))
+        self.log("failed:", err)
+        self.sock.close()
+        self.on_error and self.on_error(err, *self.args)
+
+    def close(self):
+        for listener in self.listeners:
+            listener.delete()
+        self.listeners = []
+        self.timer and self.timer.delete()
+        self.timer = None
+
+    def cancel(self): # gives up on it, calling neither callback
+        self.log("cancel")
+        self.cancelled = True
+        self.close()
+        self.sock.close()
+
+def connect(addr, on_connected, on_error=None, timeout=CONNECT_TIMEOUT, *args):
+    return Connector(addr, on_connected, on_error, timeout, *args)
+
+class Pool(Basic):
+    def __init__(self, max_per_host=POOL_MAX, idle=POOL_IDLE, timeout=CONNECT_TIMEOUT, check=None):
+        self.max_per_host = max_per_host
+        self.idle = idle
+        self.timeout = timeout
+        self.check = check
+        self.idlers = {} # addr: {sock: (watcher, timer)}
+        self.counts = {} # addr: connections open or opening
+        self.waiting = {} # addr: deque([(on_conn, on_error)])
+        self.connecting = {} # Connector: on_error
+        self.reused = 0
+        self.connects = 0
+        self.evictions = 0
+
+    def acquire(self, addr, on_conn, on_error=None):
+        idlers = self.idlers.get(addr)
+        while idlers:
+            sock = next(iter(idlers))
+            self.unpark(addr, sock)
+            if self.check and not self.check(sock):
+                self.drop(addr, sock, "failed check")
+                continue
+            self.reused += 1
+            return on_conn(sock)
+        if self.counts.get(addr, 0) < self.max_per_host:
+            self.open(addr, on_conn, on_error)
+        else:
+            self.waiting.setdefault(addr, deque()).append((on_conn, on_error))
+
+    def open(self, addr, on_conn, on_error):
+        self.counts[addr] = self.counts.get(addr, 0) + 1
+        self.connects += 1
+        connector = connect(addr, lambda sock : self.opened(connector, sock, on_conn),
+            lambda e : self.failed(addr, connector, e, on_error), self.timeout)
+        self.connecting[connector] = on_error
+
+    def opened(self, connector, sock, on_conn):
+        del self.connecting[connector]
+        on_conn(sock)
+
+    def failed(self, addr, connector, err, on_error):
+        del self.connecting[connector]
+        self.forget(addr)
+        on_error and on_error(err)
+
+    def release(self, addr, sock):
+        waiting = self.waiting.get(addr)
+        if waiting:
+            on_conn, on_error = waiting.popleft()
+            waiting or self.waiting.pop(addr)
+            self.reused += 1
+            return on_conn(sock)
+        self.idlers.setdefault(addr, {})[sock] = (
+            read(sock, lambda : self.drop(addr, sock, "readable while idle")), # bound here -- safe_read() drops args
+            rel.timeout(self.idle, self.drop, addr, sock, "idle"))
+
+    def discard(self, addr, sock):
+        sock.close()
+        self.forget(addr)
+
+    def unpark(self, addr, sock):
+        idlers = self.idlers[addr]
+        watcher, timer = idlers.pop(sock)
+        idlers or self.idlers.pop(addr)
+        watcher.delete()
+        timer.delete()
+
+    def drop(self, addr, sock, reason):
+        self.log("dropping", addr, "connection:", reason)
+        if sock in self.idlers.get(addr, ()):
+            self.unpark(addr, sock)
+        self.evictions += 1
+        self.discard(addr, sock)
+
+    def forget(self, addr): # one fewer connection -- make room for whoever is next
+        count = self.counts.get(addr, 1) - 1
+        if count:
+            self.counts[addr] = count
+        else:
+            self.counts.pop(addr, None)
+        waiting = self.waiting.get(addr)
+        if waiting:
+            on_conn, on_error = waiting.popleft()
+            waiting or self.waiting.pop(addr)
+            self.open(addr, on_conn, on_error)
+
+    def report(self):
+        return {
+            "open": sum(self.counts.values()),
+            "idle": sum([len(idlers) for idlers in self.idlers.values()]),
+            "waiting": sum([len(waiting) for waiting in self.waiting.values()]),
+            "reused": self.reused,
+            "connects": self.connects,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        for addr, idlers in list(self.idlers.items()):
+            for sock in list(idlers):
+                self.unpark(addr, sock)
+                sock.close()
+        connecting, waiting = self.connecting, self.waiting
+        self.connecting, self.waiting = {}, {}
+        self.counts.clear()
+        err = ConnectionAbortedError(errno.ECONNABORTED, "pool closed")
+        for connector, on_error in connecting.items():
+            connector.cancel()
+            on_error and on_error(err)
+        for queue in waiting.values():
+            for on_conn, on_error in queue:
+                on_error and on_error(err)
@@ -0,0 +1,99 @@
+from . import rel as rel
+from .rel import call_soon as call_soon, error as error, read as read, write as write
+from .util import Basic as Basic
+from _typeshed import Incomplete
+
+ACCEPT_BATCH: int
+ACCEPT_STOP: Incomplete
+DGRAM_BATCH: int
+DGRAM_SIZE: int
+DGRAM_QMAX: int
+DGRAM_DEST_MAX: int
+CONNECT_TIMEOUT: int
+CONNECT_PENDING: Incomplete
+CONNECT_PENDING_UNIX: Incomplete
+POOL_MAX: int
+POOL_IDLE: int
+
+class Acceptor(Basic):
+    sock: Incomplete
+    on_conn: Incomplete
+    batch: Incomplete
+    args: Incomplete
+    accepted: int
+    subname: Incomplete
+    listener: Incomplete
+    def __init__(self, sock, on_conn, batch=..., *args) -> None: ...
+    def accept(self): ...
+    def close(self) -> None: ...
+
+def listen_accept(sock, on_conn, batch=..., *args): ...
+
+class Datagram(Basic):
+    sock: Incomplete
+    on_packet: Incomplete
+    args: Incomplete
+    batch: Incomplete
+    qmax: Incomplete
+    dest_max: Incomplete
+    subname: Incomplete
+    size: Incomplete
+    pool: Incomplete
+    queue: Incomplete
+    backlog: Incomplete
+    drops: int
+    received: int
+    sent: int
+    errors: int
+    reader: Incomplete
+    writer: Incomplete
+    def __init__(self, sock, on_packet: Incomplete | None = ..., *args, batch=..., size=..., qmax=..., dest_max=...) -> None: ...
+    def receive(self): ...
+    def sendto(self, payload, addr): ...
+    def flush(self): ...
+    def report(self): ...
+    def close(self) -> None: ...
+
+class Connector(Basic):
+    addr: Incomplete
+    on_connected: Incomplete
+    on_error: Incomplete
+    args: Incomplete
+    subname: Incomplete
+    listeners: Incomplete
+    timer: Incomplete
+    cancelled: bool
+    sock: Incomplete
+    def __init__(self, addr, on_connected, on_error: Incomplete | None = ..., timeout=..., *args) -> None: ...
+    def check(self) -> None: ...
+    def expire(self) -> None: ...
+    def complete(self, err): ...
+    def close(self) -> None: ...
+    def cancel(self) -> None: ...
+
+def connect(addr, on_connected, on_error: Incomplete | None = ..., timeout=..., *args): ...
+
+class Pool(Basic):
+    max_per_host: Incomplete
+    idle: Incomplete
+    timeout: Incomplete
+    check: Incomplete
+    idlers: Incomplete
+    counts: Incomplete
+    waiting: Incomplete
+    connecting: Incomplete
+    reused: int
+    connects: int
+    evictions: int
+    def __init__(self, max_per_host=..., idle=..., timeout=..., check: Incomplete | None = ...) -> None: ...
+    def acquire(self, addr, on_conn, on_error: Incomplete | None = ...): ...
+    def open(self, addr, on_conn, on_error) -> None: ...
+    def opened(self, connector, sock, on_conn) -> None: ...
+    def failed(self, addr, connector, err, on_error) -> None: ...
+    def release(self, addr, sock): ...
+    def discard(self, addr, sock) -> None: ...
+    def unpark(self, addr, sock) -> None: ...
+    def drop(self, addr, sock, reason) -> None: ...
+    def forget(self, addr) -> None: ...
+    def report(self): ...
+    def close(self) -> None: ...
@@ -0,0 +1,120 @@
+"""
+This module contains the startup micro-probe behind the 'auto' option.
+
+### choose(methods, fds=PROBE_FDS, path=None)
+This function times each of the given (pure-Python) registrars on a
+socketpair workload sized for fds descriptors, and returns methods
+reordered fastest-first (untestable methods, like pyevent, keep their
+relative order at the end). Each round writes a byte to a slice of the
+pairs and dispatches one check_events() pass, so the cost of readiness
+polling and of dispatch both count. The winner is cached in a JSON file
+(default: rel-probe.json in the user's cache directory, XDG_CACHE_HOME
+or ~/.cache), keyed by platform, Python version, methods, and fd count
+(rounded up to a power of two, up to PROBE_MAX, the most the probe
+itself uses), so later startups skip the probe. Usually enabled via:
+
+    rel.initialize(options=["auto"], fds=1000)
+
+### probe(method, fds=PROBE_FDS, rounds=PROBE_ROUNDS)
+This function runs the benchmark for one registrar and returns the
+elapsed seconds (or None if the method is unavailable or fails).
+"""
+
+import os, sys, json, time, socket, tempfile, platform
+from .rel import mapping
+from .util import log
+
+PROBE_FDS = 64
+PROBE_MAX = 256
+PROBE_ROUNDS = 50
+PROBE_ACTIVE = 8 # every Nth pair is written to each round
+
+def default_path():
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "rel-probe.json")
+
+def bucket(fds):
+    size = 1
+    while size < fds:
+        size *= 2
+    return size
+
+def cache_key(methods, fds):
+    return "|".join([platform.system(), platform.machine(),
+        "%s.%s"%sys.version_info[:2], ",".join(methods), str(min(bucket(fds), PROBE_MAX))])
+
+def load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save(path, cache):
+    folder = os.path.dirname(path) or "."
+    try:
+        os.makedirs(folder, mode=0o700, exist_ok=True)
+        fd, temp = tempfile.mkstemp(prefix=".rel-probe-", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(cache, f)
+            os.replace(temp, path) # never writes through someone else's symlink
+        except BaseException:
+            os.unlink(temp)
+            raise
+    except OSError as e:
+        log("probe: could not cache decision: %s"%(e,))
+
+def release(reg):
+    reg.abort()
+    poller = getattr(reg, "poll", None)
+    if hasattr(poller, "close"): # epoll
+        poller.close()
+
+def probe(method, fds=PROBE_FDS, rounds=PROBE_ROUNDS):
+    if method not in mapping:
+        return None
+    try:
+        reg = mapping[method]()
+    except ImportError:
+        return None
+    pairs = []
+    try:
+        for i in range(max(1, min(fds, PROBE_MAX) // 2)):
+            local, remote = socket.socketpair()
+            local.setblocking(False)
+            pairs.append((local, remote))
+            reg.read(local, lambda sock : sock.recv(64) or True, local).persistent()
+        active = [remote for (local, remote) in pairs[::PROBE_ACTIVE]]
+        start = time.perf_counter()
+        for i in range(rounds):
+            for remote in active:
+                remote.send(b"x")
+            reg.check_events()
+        return time.perf_counter() - start
+    except (OSError, ValueError) as e: # out of fds, or past FD_SETSIZE for select
+        log('probe: "%s" failed: %s'%(method, e))
+    finally:
+        release(reg)
+        for local, remote in pairs:
+            local.close()
+            remote.close()
+
+def choose(methods, fds=PROBE_FDS, path=None):
+    path = path or default_path()
+    cache = load(path)
+    key = cache_key(methods, fds)
+    best = cache.get(key)
+    if best not in methods:
+        timings = {}
+        for method in methods:
+            elapsed = probe(method, fds)
+            if elapsed is not None:
+                timings[method] = elapsed
+        if not timings:
+            return methods
+        best = min(timings, key=timings.get)
+        log("probe: %s"%(", ".join(["%s=%.5fs"%(m, timings[m]) for m in sorted(timings, key=timings.get)]),))
+        cache[key] = best
+        save(path, cache)
+    return [best] + [m for m in methods if m != best]
@@ -0,0 +1,17 @@
+from .rel import mapping as mapping
+from .util import log as log
+from _typeshed import Incomplete
+
+PROBE_FDS: int
+PROBE_MAX: int
+PROBE_ROUNDS: int
+PROBE_ACTIVE: int
+
+def default_path(): ...
+def bucket(fds): ...
+def cache_key(methods, fds): ...
+def load(path): ...
+def save(path, cache) -> None: ...
+def release(reg) -> None: ...
+def probe(method, fds=..., rounds=...): ...
+def choose(methods, fds=..., path: Incomplete | None = ...): ...
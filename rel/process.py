@@ -0,0 +1,143 @@
+"""
+This module contains a loop-integrated subprocess API: Process and
+spawn_process().
+
+### spawn_process(argv, on_stdout=None, on_stderr=None, on_exit=None, **kwargs)
+This function starts a child process (kwargs go to subprocess.Popen)
+without any threads. Its stdout and stderr pipes are registered with
+read() in drain mode, so on_stdout(data) and on_stderr(data) get output
+as it arrives (a stream without a callback is inherited instead). The
+stdin pipe is written through buffwrite(), so write() never blocks, and
+close_stdin() closes it once everything written has been flushed:
+
+    def on_exit(code):
+        print("exited with", code)
+
+    child = spawn_process(["grep", "rel"], print, None, on_exit)
+    child.write(b"rel\\nfoo\\n")
+    child.close_stdin()
+
+Exits are reaped through a single SIGCHLD Signal shared by every
+child (polled every REAP_POLL seconds where there is no SIGCHLD), and
+on_exit(returncode) is called once the child has exited and all of
+its output has been delivered. A SIGCHLD callback registered through
+rel by the application is kept, and called first -- if it replaces
+ours later on, the next spawn_process() chains it back in. Once the
+last child is done, the shared Signal is deleted (and the application's
+callback, if any, put back), so dispatch() can return.
+"""
+
+import os, signal, subprocess
+from . import rel
+from .buff import buffwrite, when_flushed, release_buff
+from .listener import DRAIN_BUDGET
+from .util import Basic
+
+SIGCHLD = getattr(signal, "SIGCHLD", None)
+REAP_POLL = 0.1
+children = {}
+reaper = None
+poller = None
+
+def reap():
+    for child in list(children.values()):
+        child.poll()
+
+def chain(prior):
+    def __sigchld(): # just schedule -- don't reap in the handler
+        prior and prior.cb(*prior.args)
+        reaper.add(0)
+    return __sigchld
+
+def watch():
+    global reaper, poller
+    rel.check_init()
+    if reaper is None or reaper.registrar is not rel.registrar: # first child, or since rel.init()
+        reaper = rel.timeout(None, reap)
+    if SIGCHLD is None:
+        if poller is None or not poller.pending():
+            poller = rel.timeout(REAP_POLL, lambda : reap() or bool(children))
+        return
+    handler = rel.registrar.signals.get(SIGCHLD)
+    if not getattr(handler, "reaps", False): # not there, or the application's
+        ours = rel.signal(SIGCHLD, chain(handler))
+        ours.reaps = True
+        ours.prior = handler
+
+def unwatch(): # no children left -- nothing to keep the loop going for
+    handler = SIGCHLD and rel.registrar.signals.get(SIGCHLD)
+    if getattr(handler, "reaps", False):
+        handler.delete()
+        handler.prior and handler.prior.add()
+
+class Process(Basic):
+    def __init__(self, argv, on_stdout=None, on_stderr=None, on_exit=None, **kwargs):
+        self.on_exit = on_exit
+        self.proc = subprocess.Popen(argv, stdin=subprocess.PIPE,
+            stdout=on_stdout and subprocess.PIPE, stderr=on_stderr and subprocess.PIPE, **kwargs)
+        self.pid = self.proc.pid
+        self.subname = self.pid
+        self.returncode = None
+        self.streams = {}
+        for pipe, cb in ((self.proc.stdout, on_stdout), (self.proc.stderr, on_stderr)):
+            if pipe is not None:
+                reader = rel.read(pipe, self.receiver(pipe, cb), drain=DRAIN_BUDGET) # bound here -- safe_read() drops args
+                hangup = rel.error(pipe, reader.callback) # EOF on a pipe is POLLHUP
+                self.streams[pipe] = [reader, hangup]
+                for listener in self.streams[pipe]:
+                    listener.persistent()
+        os.set_blocking(self.proc.stdin.fileno(), False)
+        children[self.pid] = self
+        watch()
+        reaper.add(0) # in case it exited before it was a child of ours
+
+    def __repr__(self):
+        return '<Process Object | PID:"%s">'%(self.pid,)
+
+    def receiver(self, pipe, cb):
+        return lambda data : self.receive(data, pipe, cb)
+
+    def receive(self, data, pipe, cb):
+        if data:
+            cb(data)
+        elif data == b"": # EOF
+            for listener in self.streams.pop(pipe):
+                listener.delete()
+            pipe.close()
+            self.finish()
+        return True
+
+    def write(self, data):
+        if self.proc.stdin.closed:
+            return self.log("write: stdin closed")
+        buffwrite(self.proc.stdin, data, lambda pipe, data : os.write(pipe.fileno(), data),
+            lambda msg : self.log("stdin:", msg))
+
+    def close_stdin(self):
+        when_flushed(self.proc.stdin, self.shut_stdin)
+
+    def shut_stdin(self):
+        stdin = self.proc.stdin
+        if not stdin.closed:
+            release_buff(stdin)
+            stdin.close()
+
+    def kill(self, sig=signal.SIGTERM):
+        self.returncode is None and self.proc.send_signal(sig)
+
+    def poll(self):
+        if self.returncode is None and self.proc.poll() is not None:
+            self.returncode = self.proc.returncode
+            self.log("exited with", self.returncode)
+            self.finish()
+
+    def finish(self):
+        if self.returncode is None or self.streams or self.pid not in children:
+            return
+        del children[self.pid]
+        children or unwatch()
+        self.shut_stdin() # whatever is left, nobody will read
+        self.on_exit and self.on_exit(self.returncode)
+
+def spawn_process(argv, on_stdout=None, on_stderr=None, on_exit=None, **kwargs):
+    return Process(argv, on_stdout, on_stderr, on_exit, **kwargs)
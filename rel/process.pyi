@@ -0,0 +1,35 @@
+from . import rel as rel
+from .buff import buffwrite as buffwrite, release_buff as release_buff, when_flushed as when_flushed
+from .listener import DRAIN_BUDGET as DRAIN_BUDGET
+from .util import Basic as Basic
+from _typeshed import Incomplete
+
+SIGCHLD: Incomplete
+REAP_POLL: float
+children: Incomplete
+reaper: Incomplete
+poller: Incomplete
+
+def reap() -> None: ...
+def chain(prior): ...
+def watch() -> None: ...
+def unwatch() -> None: ...
+
+class Process(Basic):
+    on_exit: Incomplete
+    proc: Incomplete
+    pid: Incomplete
+    subname: Incomplete
+    returncode: Incomplete
+    streams: Incomplete
+    def __init__(self, argv, on_stdout: Incomplete | None = ..., on_stderr: Incomplete | None = ..., on_exit: Incomplete | None = ..., **kwargs) -> None: ...
+    def receiver(self, pipe, cb): ...
+    def receive(self, data, pipe, cb): ...
+    def write(self, data): ...
+    def close_stdin(self) -> None: ...
+    def shut_stdin(self) -> None: ...
+    def kill(self, sig=...) -> None: ...
+    def poll(self) -> None: ...
+    def finish(self) -> None: ...
+
+def spawn_process(argv, on_stdout: Incomplete | None = ..., on_stderr: Incomplete | None = ..., on_exit: Incomplete | None = ..., **kwargs): ...
@@ -5,6 +5,26 @@ each of which utilizes a different subsystem (kqueue, select, poll,
 or epoll) to manage read and write events. Registrar and its subclasses
 also manage signals and timers.
 
+### Priorities
+As in libevent, events and timers may be given a priority (lower runs
+first, default 0):
+
+    read(control_sock, on_control, priority=-1)
+    timeout(5, heartbeat, priority=-1)
+
+Once any prioritized event is registered, each loop() collects the
+ready fds and due timers before running any of them, and then runs
+them in priority order (and in poll order within a priority). When
+the loop is overloaded (see the shed module), low-priority timers are
+deferred.
+
+### Deferred Work
+call_soon(cb, *args) queues a one-shot callback (FIFO, O(1), no Timer)
+that runs at the start of the next loop(), before polling, and the loop
+doesn't sleep while any are queued. idle(cb, *args) registers a callback
+that runs on passes where no I/O was dispatched, until it returns False.
+Idle callbacks don't keep the loop from sleeping between passes.
+
 ### Reads and Writes
 Reads and writes are handled by the SocketIO class defined in the
 listener module, which is instantiated by a couple Registrar functions:
@@ -23,8 +43,13 @@ a couple Registrar functions:
     def signal(self,sig,cb,*args):
         return Signal(self,sig,cb,*args)
 
-    def timeout(self,delay,cb,*args):
-        return Timer(self,delay,cb,*args)
+    def timeout(self,delay,cb,*args,slack=0):
+        return Timer(self,delay,cb,*args,slack=slack)
+
+Pending timers are kept in a heap ordered by expiration. Cancelling
+a timer just leaves a tombstone in its heap entry, which check_timers()
+skips, and the heap is compacted once tombstones outnumber live timers
+(and exceed TOMBSTONE_MAX). The live and dead counts show up in report().
 
 The Registrar API is taken from [pyevent](https://github.com/jaraco/pyevent),
 which is a wrapper around [libevent](http://monkey.org/~provos/libevent/).
@@ -49,11 +74,25 @@ in which case it ramps up to push the bytes through faster. These rates
     def set_turbo(s):
         global SLEEP_TURBO
         SLEEP_TURBO = s
+
+### Virtual Time
+For tests and simulations, the pure-Python registrars can run on a
+simulated clock instead of the system one:
+
+    set_virtual(True)
+
+In virtual mode the loop never sleeps. Whenever no fds are ready, the
+clock jumps straight to the next timer expiration, so a 5-second timeout
+fires immediately while still going through the regular dispatch. The
+current time (virtual or not) is available via clock(). The virtual
+clock never runs backwards: switching virtual mode on again (or twice)
+doesn't rewind it.
 """
 
-from datetime import datetime
-import select, signal, time, operator, errno
-from .listener import Event, SocketIO, Timer, Signal, contains
+import select, signal, time, heapq, errno
+from collections import deque
+from .listener import Event, SocketIO, Timer, Signal, Bucket, contains
+from .wheel import Wheel
 from .errors import AbortBranch
 from .util import Basic
 try:
@@ -67,6 +106,10 @@ LISTEN_POLL = 0
 SLEEP_SEC = .03
 SLEEP_TURBO = 0.0006
 SEL_MAX_FD = 256
+TOMBSTONE_MAX = 256
+DRAIN_POLL = 0.1
+VIRTUAL = False
+vclock = 0
 
 def set_sleep(s):
     global SLEEP_SEC
@@ -76,6 +119,25 @@ def set_turbo(s):
     global SLEEP_TURBO
     SLEEP_TURBO = s
 
+def set_virtual(v):
+    global VIRTUAL, vclock
+    if v and not VIRTUAL: # starts from now (in whole seconds, so timer sums stay exact) -- or where it left off
+        vclock = max(vclock, float(int(time.monotonic()) + 1))
+    VIRTUAL = v
+
+def clock():
+    if VIRTUAL:
+        return vclock
+    return time.monotonic()
+
+def label(listener): # stable per callback, so stats aggregate (no addresses)
+    if isinstance(listener, (SocketIO, Timer)):
+        try:
+            return repr(listener)
+        except Exception: # probably a callback without a __name__
+            pass
+    return getattr(listener, "__qualname__", listener.__class__.__name__)
+
 def kbint(signals):
     if signal.SIGINT in signals:
         return True
@@ -85,18 +147,45 @@ class Registrar(Basic):
     def __init__(self):
         self.events = {'read':{},'write':{},'error':{}}
         self.timers = set()
-        self.ordered_timers = None
+        self.theap = []
+        self.tseq = 0
+        self.dead = 0
+        self.compactions = 0
         self.signals = {}
         self.tick = 0
+        self.dispatched = 0
+        self.prioritized = False
+        self.ready = None
+        self.lag = 0
+        self.maxlag = 0
+        self.timing = False
+        self.tracer = None
+        self.sampler = None
+        self.shedder = None
+        self.stats = {}
+        self.limits = {}
+        self.draining = None
+        self.soon = deque()
+        self.idlers = deque()
         self.run_dispatch = False
         self.error_check = False
 
     def report(self):
         return {
+            "lag": self.lag,
+            "maxlag": self.maxlag,
             "timers": len(self.timers),
+            "tombstones": self.dead,
+            "compactions": self.compactions,
             "signals": len(list(self.signals.keys())),
             "reads": len(list(self.events["read"].keys())),
-            "writes": len(list(self.events["write"].keys()))
+            "writes": len(list(self.events["write"].keys())),
+            "soon": len(self.soon),
+            "idle": len(self.idlers),
+            "draining": self.draining and {
+                "unsent": self.draining["unsent"],
+                "remaining": max(0, self.draining["deadline"] - self.now())
+            }
         }
 
     def signal_add(self, sig):
@@ -111,21 +200,21 @@ class Registrar(Basic):
             self.signals[sig].reset()
         self.__init__()
 
-    def event(self,callback,arg,evtype,handle):
+    def event(self,callback,arg,evtype,handle,priority=0):
         self.log("event")
-        return Event(self,callback,arg,evtype,handle)
+        return Event(self,callback,arg,evtype,handle,priority)
 
-    def read(self,sock,cb,*args):
+    def read(self,sock,cb,*args,priority=0,drain=0):
         self.log("read")
-        return SocketIO(self,'read',sock,cb,*args)
+        return SocketIO(self,'read',sock,cb,*args,priority=priority,drain=drain)
 
-    def write(self,sock,cb,*args):
+    def write(self,sock,cb,*args,priority=0):
         self.log("write")
-        return SocketIO(self,'write',sock,cb,*args)
+        return SocketIO(self,'write',sock,cb,*args,priority=priority)
 
-    def error(self,sock,cb,*args):
+    def error(self,sock,cb,*args,priority=0):
         self.log("error")
-        return SocketIO(self,'error',sock,cb,*args)
+        return SocketIO(self,'error',sock,cb,*args,priority=priority)
 
     def dispatch(self):
         self.run_dispatch = True
@@ -136,23 +225,90 @@ class Registrar(Basic):
     def pause(self):
         self.run_dispatch = False
 
+    def now(self):
+        return clock()
+
     def loop(self):
-        if SLEEP_TURBO and (self.events["write"] or self.events["read"]):
-            time.sleep(SLEEP_TURBO)
+        start = time.monotonic()
+        nap = 0
+        if VIRTUAL or self.soon:
+            pass # no sleeping on the virtual clock (see advance()) or with work queued
+        elif SLEEP_TURBO and (self.events["write"] or self.events["read"]):
+            nap = SLEEP_TURBO
+        else:
+            nap = SLEEP_SEC
+        tracer = self.tracer
+        mark = tracer and time.perf_counter()
+        nap and time.sleep(nap)
+        self.tick = int(time.time() % 1 * 1000000) # microsecond, sans datetime
+        dispatched = self.dispatched
+        self.ready = [] if self.prioritized else None
+        self.soon and self.run_soon()
+        polled = self.dispatched
+        if tracer:
+            begun = time.perf_counter()
+            nap and tracer.add("sleep", None, mark, mark + nap)
+            e = self.check_events()
+            tracer.add("poll", None, begun, time.perf_counter(), self.dispatched - polled)
         else:
-            time.sleep(SLEEP_SEC)
-        self.tick = datetime.now().microsecond
-        e = self.check_events()
+            e = self.check_events()
+        if self.idlers and self.dispatched == polled:
+            self.run_idle()
+        if VIRTUAL and self.dispatched == dispatched:
+            self.advance()
         t = self.check_timers()
-        return e or t or self.signals
+        if self.ready:
+            self.run_ready()
+        self.ready = None
+        self.lag = time.monotonic() - start - nap
+        self.maxlag = max(self.maxlag, self.lag)
+        self.shedder and self.shedder.measure(self.lag)
+        return e or t or self.signals or self.soon or self.idlers
+
+    def advance(self):
+        global vclock
+        heap = self.theap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+            self.dead -= 1
+        if heap:
+            vclock = max(vclock, heap[0][0])
+            return
+        time.sleep(SLEEP_SEC) # nothing scheduled -- give threads and signals a chance
 
     def abort(self):
         self.log("abort")
         self.run_dispatch = False
+        self.draining = None
         for ev_list in list(self.events.values()):
             for sockio in list(ev_list.values()):
                 sockio.delete()
 
+    def drain(self,timeout,cb=None,pending=None):
+        self.log("drain", timeout)
+        for sockio in list(self.events["read"].values()):
+            sockio.delete()
+        self.draining = {
+            "deadline": self.now() + timeout,
+            "cb": cb,
+            "pending": pending or (lambda : 0),
+            "unsent": None
+        }
+        self.drained() and self.timeout(DRAIN_POLL, self.drained)
+
+    def drained(self):
+        d = self.draining
+        if d is None: # aborted or re-initialized meanwhile
+            return False
+        d["unsent"] = d["pending"]()
+        if d["unsent"] and self.now() < d["deadline"]:
+            return True
+        self.log("drained", d["unsent"] and "(abandoning %s bytes)"%(d["unsent"],) or "(clean)")
+        self.draining = None
+        self.abort()
+        d["cb"] and d["cb"](d["unsent"])
+        return False
+
     def abort_branch(self):
         self.log("abort_branch")
         raise AbortBranch()
@@ -161,36 +317,166 @@ class Registrar(Basic):
         self.log("signal")
         return Signal(self,sig,cb,*args)
 
-    def timeout(self,delay,cb,*args):
+    def timeout(self,delay,cb,*args,slack=0,priority=0):
         self.log("timeout")
-        return Timer(self,delay,cb,*args)
+        return Timer(self,delay,cb,*args,slack=slack,priority=priority)
+
+    def bucket(self,rate,burst=None):
+        return Bucket(self,rate,burst)
+
+    def limit(self,evtype,rate,burst=None):
+        self.log("limit", evtype, rate)
+        if rate:
+            self.limits[evtype] = Bucket(self,rate,burst)
+        else:
+            self.limits.pop(evtype, None)
+
+    def wheel(self,timeout,granularity=1):
+        self.log("wheel")
+        return Wheel(self,timeout,granularity)
 
     def add_timer(self, timer):
-         self.timers.add(timer)
-         # Force a re-sort of the list
-         self.ordered_timers = None
+        self.kill_entry(timer)
+        self.tseq += 1
+        timer.entry = [timer.expiration, self.tseq, timer]
+        heapq.heappush(self.theap, timer.entry)
+        self.timers.add(timer)
 
     def remove_timer(self, timer):
-         self.timers.discard(timer)
-         # Force a re-sort of the list
-         self.ordered_timers = None
+        self.timers.discard(timer)
+        self.kill_entry(timer)
+
+    def kill_entry(self, timer):
+        # leave a tombstone in the heap -- check_timers() skips it
+        if timer.entry is not None:
+            timer.entry[2] = None
+            timer.entry = None
+            self.dead += 1
+            if self.dead > TOMBSTONE_MAX and self.dead > len(self.timers):
+                self.compact() # cancelled, or re-armed while pending
+
+    def compact(self):
+        self.log("compact", self.dead, "tombstones")
+        self.theap = [entry for entry in self.theap if entry[2] is not None]
+        heapq.heapify(self.theap)
+        self.dead = 0
+        self.compactions += 1
 
     def check_timers(self):
-        if self.ordered_timers is None:
-            # The timers list has changed, create and sort it
-            self.ordered_timers = sorted(self.timers, key=operator.attrgetter("expiration"))
-        t = time.monotonic()
-        for timer in self.ordered_timers:
-            if not timer.check(t):
-                self.remove_timer(timer)
-        return bool(self.timers)
+        t = self.now()
+        heap = self.theap
+        due = []
+        while heap and heap[0][0] <= t:
+            timer = heapq.heappop(heap)[2]
+            if timer is None:
+                self.dead -= 1
+            else:
+                timer.entry = None
+                due.append(timer)
+        if due and self.shedder and self.shedder.overloaded:
+            due = self.shedder.sift(due, t)
+        if self.ready is not None:
+            self.ready.extend([(timer.priority, "timer", timer) for timer in due])
+            return bool(self.timers or due)
+        for i, timer in enumerate(due):
+            try:
+                self.fire_timer(timer, t)
+            except:
+                self.requeue(due[i+1:])
+                raise
+        return bool(self.timers or due) # fired timers may have (re)registered events
+
+    def fire_timer(self, timer, t):
+        if self.timing or self.tracer or self.sampler:
+            alive = self.timed(timer, timer.check, t, note=timer.expiration and t - timer.expiration) # lateness
+        else:
+            alive = timer.check(t)
+        alive or self.remove_timer(timer)
+
+    def requeue(self, timers):
+        # popped from the heap but never fired (a callback raised) -- put them back
+        for timer in timers:
+            timer.pending() and timer.entry is None and self.add_timer(timer)
+
+    def run_ready(self):
+        ready = self.ready
+        self.ready = None
+        ready.sort(key=lambda r : r[0]) # stable -- poll order is kept within a priority
+        t = self.now()
+        for i, (priority, etype, target) in enumerate(ready):
+            try:
+                if etype == "timer":
+                    self.fire_timer(target, t)
+                elif target in self.events[etype]:
+                    self.fire(etype, target)
+            except:
+                self.requeue([r[2] for r in ready[i+1:] if r[1] == "timer"])
+                raise
+
+    def call_soon(self, cb, *args):
+        self.soon.append((cb, args))
+
+    def idle(self, cb, *args):
+        self.idlers.append((cb, args))
+
+    def run_soon(self):
+        soon = self.soon
+        for i in range(len(soon)): # anything queued meanwhile waits for the next pass
+            cb, args = soon.popleft()
+            self.dispatched += 1
+            if self.timing or self.tracer or self.sampler:
+                self.timed(cb, cb, *args)
+            else:
+                cb(*args)
+
+    def run_idle(self):
+        idlers = self.idlers
+        for i in range(len(idlers)):
+            cb, args = idlers.popleft()
+            self.dispatched += 1
+            if self.timing or self.tracer or self.sampler:
+                again = self.timed(cb, cb, *args)
+            else:
+                again = cb(*args)
+            again and idlers.append((cb, args))
 
     def callback(self, etype, fd):
+        self.dispatched += 1
+        if self.ready is not None:
+            return self.ready.append((self.events[etype][fd].priority, etype, fd))
+        self.fire(etype, fd)
+
+    def fire(self, etype, fd):
         try:
-            self.events[etype][fd].callback()
+            if self.timing or self.tracer or self.sampler:
+                self.timed(self.events[etype][fd], self.events[etype][fd].callback)
+            else:
+                self.events[etype][fd].callback()
         except AbortBranch as e:
             self.log("AbortBranch") # just go on with other code :)
 
+    def timed(self, listener, cb, *args, note=None):
+        sampler = self.sampler
+        sampled = sampler and sampler.pick()
+        sampled and sampler.enter(listener)
+        start = time.perf_counter()
+        try:
+            return cb(*args)
+        finally:
+            end = time.perf_counter()
+            sampled and sampler.leave(listener, end - start)
+            self.timing and self.record(listener, end - start)
+            self.tracer and self.tracer.add("callback", listener, start, end, note)
+
+    def record(self, listener, duration):
+        name = label(listener)
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = [0, 0, 0]
+        stat[0] += 1
+        stat[1] += duration
+        stat[2] = max(stat[2], duration)
+
     def handle_error(self, fd):
         self.log("handle_error", fd)
         if fd in self.events['error']:
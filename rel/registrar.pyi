@@ -1,5 +1,6 @@
 from .errors import AbortBranch as AbortBranch
-from .listener import Event as Event, Signal as Signal, SocketIO as SocketIO, Timer as Timer, contains as contains
+from .listener import Bucket as Bucket, Event as Event, Signal as Signal, SocketIO as SocketIO, Timer as Timer, contains as contains
+from .wheel import Wheel as Wheel
 from _typeshed import Incomplete
 
 LISTEN_KQUEUE: int
@@ -8,18 +9,43 @@ LISTEN_POLL: int
 SLEEP_SEC: float
 SLEEP_TURBO: float
 SEL_MAX_FD: int
+TOMBSTONE_MAX: int
+DRAIN_POLL: float
+VIRTUAL: bool
+vclock: float
 
 def set_sleep(s) -> None: ...
 def set_turbo(s) -> None: ...
+def set_virtual(v) -> None: ...
+def clock(): ...
+def label(listener): ...
 def kbint(signals): ...
 
 class Registrar:
     events: Incomplete
     timers: Incomplete
+    theap: Incomplete
+    tseq: int
+    dead: int
+    compactions: int
     addlist: Incomplete
     rmlist: Incomplete
     signals: Incomplete
     tick: int
+    dispatched: int
+    prioritized: bool
+    ready: Incomplete
+    lag: float
+    maxlag: float
+    timing: bool
+    tracer: Incomplete
+    sampler: Incomplete
+    shedder: Incomplete
+    stats: Incomplete
+    limits: Incomplete
+    draining: Incomplete
+    soon: Incomplete
+    idlers: Incomplete
     run_dispatch: bool
     error_check: bool
     def __init__(self) -> None: ...
@@ -27,20 +53,39 @@ class Registrar:
     def signal_add(self, sig) -> None: ...
     def signal_remove(self, sig) -> None: ...
     def init(self) -> None: ...
-    def event(self, callback, arg, evtype, handle): ...
-    def read(self, sock, cb, *args): ...
-    def write(self, sock, cb, *args): ...
-    def error(self, sock, cb, *args): ...
+    def event(self, callback, arg, evtype, handle, priority: int = ...): ...
+    def read(self, sock, cb, *args, priority: int = ..., drain: int = ...): ...
+    def write(self, sock, cb, *args, priority: int = ...): ...
+    def error(self, sock, cb, *args, priority: int = ...): ...
     def dispatch(self) -> None: ...
+    def now(self): ...
     def loop(self): ...
+    def advance(self) -> None: ...
     def abort(self) -> None: ...
+    def drain(self, timeout, cb: Incomplete | None = ..., pending: Incomplete | None = ...) -> None: ...
+    def drained(self): ...
     def abort_branch(self) -> None: ...
     def signal(self, sig, cb, *args): ...
-    def timeout(self, delay, cb, *args): ...
+    def timeout(self, delay, cb, *args, slack: int = ..., priority: int = ...): ...
+    def bucket(self, rate, burst: Incomplete | None = ...): ...
+    def limit(self, evtype, rate, burst: Incomplete | None = ...) -> None: ...
+    def wheel(self, timeout, granularity: int = ...): ...
     def add_timer(self, timer) -> None: ...
     def remove_timer(self, timer) -> None: ...
+    def kill_entry(self, timer) -> None: ...
+    def compact(self) -> None: ...
     def check_timers(self): ...
-    def callback(self, etype, fd) -> None: ...
+    def fire_timer(self, timer, t) -> None: ...
+    def requeue(self, timers) -> None: ...
+    def run_ready(self) -> None: ...
+    def call_soon(self, cb, *args) -> None: ...
+    def idle(self, cb, *args) -> None: ...
+    def run_soon(self) -> None: ...
+    def run_idle(self) -> None: ...
+    def callback(self, etype, fd): ...
+    def fire(self, etype, fd) -> None: ...
+    def timed(self, listener, cb, *args, note: Incomplete | None = ...): ...
+    def record(self, listener, duration) -> None: ...
     def handle_error(self, fd) -> None: ...
     def handle_error_nah(self, fd) -> None: ...
 
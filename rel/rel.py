@@ -5,14 +5,20 @@ which is a wrapper around [libevent](http://monkey.org/~provos/libevent/), provi
 without the need to compile C code, and without breaking the GIL / threading.
 
 ### basic functions:
-    read(socket, callback, *args)
-    write(socket, callback, *args)
-    timeout(delay, callback, *args)
+    read(socket, callback, *args, priority=0, drain=0)
+    write(socket, callback, *args, priority=0)
+    timeout(delay, callback, *args, slack=0, priority=0)
+    call_soon(callback, *args)
+    idle(callback, *args)
+    wheel(timeout, granularity=1) (non-pyevent only)
+    bucket(rate, burst=None) (non-pyevent only)
+    limit(evtype, rate, burst=None) (non-pyevent only)
     signal(sig, callback, *args)
-    event(callback,arg=None,evtype=0,handle=None)
+    event(callback,arg=None,evtype=0,handle=None,priority=0)
     dispatch()
     loop()
     abort()
+    drain(timeout, on_done=None) (non-pyevent only)
     abort_branch() (non-pyevent only)
     thread()
     init()
@@ -25,25 +31,52 @@ rel will use the fastest registrar available on your system:
 The supported_methods[] registrar priority list, as well as other
 settings, can be altered using the (optional) initialize() function:
 
-### initialize(methods=supported_methods,options=()) - possible options:
+### initialize(methods=supported_methods,options=(),fds=None) - possible options:
     'verbose' - prints out certain events
     'report' - prints status of non-pyevent registrar every 5 seconds
+    'status' - serves live status (see status module) -- view with rtop
+    'trace' - record loop activity, dumped on SIGUSR2 (see trace module)
+    'sample' - toggle the callback sampling profiler on SIGUSR1 (see sampler module)
+    'shed' - shed load when the loop lags (see shed module)
     'strict' - ONLY try specified methods
+    'auto' - benchmark the registrars for fds descriptors (see probe module)
     'threaded' - enable GIL hack -- pyevent only!
+    'virtual' - run timers on a simulated clock (see set_virtual())
+
+### drain(timeout, on_done=None)
+This function shuts rel down gracefully. Reads (including listening
+sockets) are unregistered at once, and no new ones are accepted, but
+write events keep going until every buffwrite() buffer is flushed or
+timeout seconds pass. Then rel aborts and on_done(unsent) is called
+with the number of bytes abandoned (0 on a clean drain). Meanwhile,
+report() has a "draining" entry with the unsent and remaining time:
+
+    rel.signal(15, rel.drain, 30, lambda unsent : sys.exit(bool(unsent)))
 
 ### override()
 This override function can be used to seamlessly swap rel into
 a pyevent application.
+
+### import time
+import rel loads the loop and little else. pyevent, ssl, threading and
+pprint are imported when first needed, as are the buff, net, process
+and task modules behind rel.buffwrite(), rel.listen_accept(),
+rel.connect(), rel.spawn_process() and rel.spawn_task(). The registrar
+classes are imported up front on purpose: the first rel call needs one
+of them anyway, and they live in registrar.py with the loop itself,
+needing nothing beyond select. The cumulative "import rel" time is
+budgeted at IMPORT_BUDGET (100ms -- it's around 30ms on a typical
+machine), which UtilTest.test_import_time checks (REL_NO_BENCH=1 skips
+it). To see where the time goes:
+
+    python -X importtime -c "import rel" 2>&1 | sort -t'|' -k2 -n | tail
 """
 
-import sys, threading, time, pprint
-from .registrar import set_sleep, set_turbo, SelectRegistrar, PollRegistrar, EpollRegistrar, KqueueRegistrar
+import sys, time
+from .registrar import set_sleep, set_turbo, set_virtual, clock, SelectRegistrar, PollRegistrar, EpollRegistrar, KqueueRegistrar
 from .listener import EV_PERSIST, EV_READ, EV_SIGNAL, EV_TIMEOUT, EV_WRITE
 from .util import log, set_verbose
-try:
-    import event as pyevent
-except ImportError:
-    pyevent = None
+pyevent = None # imported by get_registrar("pyevent"), if it gets that far
 
 def override():
     if 'event' in sys.modules and sys.modules['event'].__class__.__name__ == "fakemodule":
@@ -98,16 +131,12 @@ mapping = {
 }
 
 def __report():
+    import pprint
+    from .status import snapshot
     print("=" * 60)
     print("rel status report".center(60))
-    print(str(time.time()).center(60))
     print("-" * 60)
-    print("events".center(60))
-    pprint.pprint(registrar.events)
-    print("signals".center(60))
-    pprint.pprint(registrar.signals)
-    print("timers".center(60))
-    pprint.pprint(registrar.timers)
+    pprint.pprint(snapshot())
     print("=" * 60)
     return True
 
@@ -136,7 +165,8 @@ class Thread_Checker(object):
         return True
 
     def check(self):
-        if threading.activeCount() > 1:
+        import threading
+        if threading.active_count() > 1:
             if not self.sleeper.pending():
                 log('Enabling GIL hack')
                 self.sleeper.add(.01)
@@ -151,31 +181,47 @@ def check_init():
         initialize()
 
 def get_registrar(method):
+    global pyevent
     if method == 'pyevent':
         if not pyevent:
-            raise ImportError("could not import event")
+            event = sys.modules.get('event')
+            if event is not None and event.__class__.__name__ == "fakemodule":
+                raise ImportError("event is rel (see override())")
+            import event as pyevent
         return pyevent
     if method in mapping:
         return mapping[method]()
     raise ImportError
 
-def initialize(methods=supported_methods,options=()):
+def initialize(methods=supported_methods,options=(),fds=None):
     """
-    initialize(methods=['epoll','kqueue','poll','select','pyevent'],options=[])
+    initialize(methods=['epoll','kqueue','poll','select','pyevent'],options=[],fds=None)
     possible options:
         'verbose' - prints out certain events
         'report' - prints status of non-pyevent registrar every 5 seconds
+        'status' - serves live status (see status module) -- view with rtop
+        'trace' - record loop activity, dumped on SIGUSR2 (see trace module)
+        'sample' - toggle the callback sampling profiler on SIGUSR1 (see sampler module)
+        'shed' - shed load when the loop lags (see shed module)
         'strict' - ONLY try specified methods
+        'auto' - order methods by a (cached) benchmark for fds descriptors
         'threaded' - enable GIL hack -- pyevent only!
+        'virtual' - run timers on a simulated clock -- non-pyevent only!
     """
     global registrar
     global threader
     if "verbose" in options:
         set_verbose(True)
+    if "virtual" in options:
+        set_virtual(True)
+    methods = list(methods)
     if "strict" not in options:
         for m in supported_methods:
             if m not in methods:
                 methods.append(m)
+    if "auto" in options:
+        from .probe import choose, PROBE_FDS
+        methods = choose(methods, fds or PROBE_FDS)
     for method in methods:
         try:
             registrar = get_registrar(method)
@@ -191,6 +237,24 @@ def initialize(methods=supported_methods,options=()):
             log('Reporting disabled in pyevent. Choose epoll, kqueue, poll, or select to enable reporting.')
         else:
             timeout(5,__report)
+    if "status" in options:
+        if registrar == pyevent:
+            log('Status disabled in pyevent. Choose epoll, kqueue, poll, or select to enable status.')
+        else:
+            from .status import serve
+            serve()
+    if "trace" in options:
+        from .trace import start, on_signal
+        start() and on_signal()
+    if "sample" in options:
+        if registrar == pyevent:
+            log('Sampling disabled in pyevent. Choose epoll, kqueue, poll, or select to enable sampling.')
+        else:
+            from .sampler import on_signal
+            on_signal()
+    if "shed" in options:
+        from .shed import start
+        start()
     return method
 
 SAFE_READ = False
@@ -198,23 +262,50 @@ def safe_read():
     global SAFE_READ
     SAFE_READ = True
 
-def read(sock,cb,*args):
+def extras(**kwargs): # only non-default options -- pyevent doesn't take them
+    return dict([(k, v) for (k, v) in kwargs.items() if v])
+
+def read(sock,cb,*args,priority=0,drain=0):
     check_init()
     if SAFE_READ:
-        return registrar.read(sock,cb)
-    return registrar.read(sock,cb,*args)
+        args = ()
+    return registrar.read(sock,cb,*args,**extras(priority=priority, drain=drain))
+
+def write(sock,cb,*args,priority=0):
+    check_init()
+    return registrar.write(sock,cb,*args,**extras(priority=priority))
+
+def error(sock,cb,*args,priority=0):
+    check_init()
+    return registrar.error(sock,cb,*args,**extras(priority=priority))
+
+def timeout(delay, cb, *args, slack=0, priority=0):
+    check_init()
+    return registrar.timeout(delay,cb,*args,**extras(slack=slack, priority=priority))
 
-def write(sock,cb,*args):
+def call_soon(cb, *args):
     check_init()
-    return registrar.write(sock,cb,*args)
+    if registrar == pyevent:
+        return timeout(0, lambda : cb(*args) and None)
+    registrar.call_soon(cb, *args)
 
-def error(sock,cb,*args):
+def idle(cb, *args):
     check_init()
-    return registrar.error(sock,cb,*args)
+    if registrar == pyevent:
+        return timeout(0, cb, *args)
+    registrar.idle(cb, *args)
 
-def timeout(delay, cb, *args):
+def bucket(rate, burst=None):
     check_init()
-    return registrar.timeout(delay,cb,*args)
+    return registrar.bucket(rate,burst)
+
+def limit(evtype, rate, burst=None):
+    check_init()
+    registrar.limit(evtype,rate,burst)
+
+def wheel(timeout, granularity=1):
+    check_init()
+    return registrar.wheel(timeout,granularity)
 
 def signal(sig, callback, *args):
     check_init()
@@ -256,6 +347,19 @@ def abort():
     check_init()
     registrar.abort()
 
+def drain(timeout, on_done=None):
+    from .buff import queued
+    check_init()
+    def done(unsent):
+        global running
+        running = False
+        on_done and on_done(unsent)
+    if registrar == pyevent:
+        log('Draining disabled in pyevent. Aborting.')
+        abort()
+        return on_done and on_done(None)
+    registrar.drain(timeout, done, lambda : sum(queued().values()))
+
 def abort_branch():
     check_init()
     registrar.abort_branch()
@@ -268,9 +372,9 @@ def init():
     registrar.init()
     threader.go()
 
-def event(callback,arg=None,evtype=0,handle=None):
+def event(callback,arg=None,evtype=0,handle=None,priority=0):
     check_init()
-    return registrar.event(callback,arg,evtype,handle)
+    return registrar.event(callback,arg,evtype,handle,**extras(priority=priority))
 
 def _thread_wrapper(callback):
     from .errors import AbortBranch
@@ -280,6 +384,7 @@ def _thread_wrapper(callback):
         pass # we don't care at this point
 
 def thread(callback):
+    import threading
     threading.Thread(target=_thread_wrapper, args=(callback,)).start()
 
 def tick():
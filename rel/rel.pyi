@@ -1,5 +1,5 @@
 from .listener import EV_PERSIST as EV_PERSIST, EV_READ as EV_READ, EV_SIGNAL as EV_SIGNAL, EV_TIMEOUT as EV_TIMEOUT, EV_WRITE as EV_WRITE
-from .registrar import EpollRegistrar as EpollRegistrar, KqueueRegistrar as KqueueRegistrar, PollRegistrar as PollRegistrar, SelectRegistrar as SelectRegistrar, set_sleep as set_sleep, set_turbo as set_turbo
+from .registrar import EpollRegistrar as EpollRegistrar, KqueueRegistrar as KqueueRegistrar, PollRegistrar as PollRegistrar, SelectRegistrar as SelectRegistrar, set_sleep as set_sleep, set_turbo as set_turbo, set_virtual as set_virtual, clock as clock
 from _typeshed import Incomplete
 
 def override() -> None: ...
@@ -26,24 +26,31 @@ class Thread_Checker:
 def check_init() -> None: ...
 def get_registrar(method): ...
 def set_verbose(isverb) -> None: ...
-def initialize(methods=..., options=...): ...
+def initialize(methods=..., options=..., fds: Incomplete | None = ...): ...
 
 SAFE_READ: bool
 
 def safe_read() -> None: ...
-def read(sock, cb, *args): ...
-def write(sock, cb, *args): ...
-def error(sock, cb, *args): ...
-def timeout(delay, cb, *args): ...
+def extras(**kwargs): ...
+def read(sock, cb, *args, priority: int = ..., drain: int = ...): ...
+def write(sock, cb, *args, priority: int = ...): ...
+def error(sock, cb, *args, priority: int = ...): ...
+def timeout(delay, cb, *args, slack: int = ..., priority: int = ...): ...
+def call_soon(cb, *args): ...
+def idle(cb, *args): ...
+def bucket(rate, burst: Incomplete | None = ...): ...
+def limit(evtype, rate, burst: Incomplete | None = ...) -> None: ...
+def wheel(timeout, granularity: int = ...): ...
 def signal(sig, callback, *args): ...
 def dispatch() -> None: ...
 def loop() -> None: ...
 def report(): ...
 def is_running(): ...
 def abort() -> None: ...
+def drain(timeout, on_done: Incomplete | None = ...): ...
 def abort_branch() -> None: ...
 def init() -> None: ...
-def event(callback, arg: Incomplete | None = ..., evtype: int = ..., handle: Incomplete | None = ...): ...
+def event(callback, arg: Incomplete | None = ..., evtype: int = ..., handle: Incomplete | None = ..., priority: int = ...): ...
 def thread(callback) -> None: ...
 def tick(): ...
 def start() -> None: ...
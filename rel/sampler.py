@@ -0,0 +1,148 @@
+"""
+This module contains an opt-in sampling profiler for rel callbacks:
+Sampler, start(), stop(), summary(), and toggle().
+
+### start(every=SAMPLE_EVERY, deep=False)
+This function attaches a Sampler to the registrar, which times one in
+every callback invocations on average (reads, writes, timers, call_soon
+and idle work alike -- the gap between samples is random, so periodic
+workloads don't alias with it) and aggregates them per callback, named
+as in status (the SocketIO/Timer __repr__, or for call_soon and idle
+work, the function's __qualname__). With deep=True, each sampled
+invocation also runs under a per-callback cProfile.Profile, so
+summary() can break a callback's time down by function. Unsampled
+invocations cost a counter decrement.
+
+### summary(top=SAMPLE_TOP)
+This function returns a flame-style text summary: callbacks sorted by
+their estimated share of the loop's callback time, with a bar, sample
+count, mean and max duration, and (when deep) their hottest functions
+indented underneath.
+
+### toggle() / on_signal(sig=SAMPLE_SIGNAL)
+toggle() starts sampling, or stops it and writes summary() to
+rel-profile-[pid].txt in the temp directory. on_signal() binds it to a
+signal (default SIGUSR1 -- SIGPROF belongs to real profilers), so a
+live process can be profiled on demand:
+
+    rel.initialize(options=["sample"])  # then: kill -USR1 <pid>
+"""
+
+import os, signal, random, cProfile, tempfile
+from . import rel
+from .registrar import label
+
+SAMPLE_EVERY = 10
+SAMPLE_TOP = 20
+SAMPLE_DEEP_TOP = 5
+SAMPLE_BAR = 30
+SAMPLE_SIGNAL = getattr(signal, "SIGUSR1", None)
+
+def default_path(pid=None):
+    return os.path.join(tempfile.gettempdir(), "rel-profile-%s.txt"%(pid or os.getpid(),))
+
+class Sampler(object):
+    def __init__(self, every=SAMPLE_EVERY, deep=False):
+        self.every = max(1, int(every))
+        self.deep = deep
+        self.countdown = self.gap()
+        self.samples = 0
+        self.stats = {}
+        self.profiles = {}
+        self.profiling = None
+
+    def __repr__(self):
+        return '<Sampler Object | Samples:"%s">'%(self.samples,)
+
+    def gap(self): # 1 to 2 * every - 1 -- every, on average
+        return random.randint(1, 2 * self.every - 1)
+
+    def pick(self):
+        self.countdown -= 1
+        if self.countdown:
+            return False
+        self.countdown = self.gap()
+        return True
+
+    def enter(self, listener):
+        if not self.deep or self.profiling is not None:
+            return
+        name = label(listener)
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = self.profiles[name] = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError: # some other profiler is active
+            return
+        self.profiling = profile
+
+    def leave(self, listener, duration):
+        if self.profiling is not None:
+            self.profiling.disable()
+            self.profiling = None
+        self.samples += 1
+        name = label(listener)
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = [0, 0, 0]
+        stat[0] += 1
+        stat[1] += duration
+        stat[2] = max(stat[2], duration)
+
+    def hottest(self, name, top=SAMPLE_DEEP_TOP):
+        profile = self.profiles.get(name)
+        if profile is None:
+            return []
+        profile.create_stats()
+        funcs = [(tt, "%s:%s(%s)"%(os.path.basename(f), line, func))
+            for ((f, line, func), (cc, nc, tt, ct, callers)) in profile.stats.items()]
+        total = sum([tt for (tt, where) in funcs]) or 1
+        return [(tt / total, where) for (tt, where) in sorted(funcs, reverse=True)[:top]]
+
+    def summary(self, top=SAMPLE_TOP):
+        total = sum([stat[1] for stat in self.stats.values()])
+        lines = ["rel callback profile: %s samples (1 in %s), ~%.3fs of callback time"%(
+            self.samples, self.every, total * self.every),
+            "%7s %8s %10s %10s  %s"%("share", "samples", "mean ms", "max ms", "callback")]
+        for name, (count, spent, slowest) in sorted(self.stats.items(),
+            key=lambda s : s[1][1], reverse=True)[:top]:
+            share = total and spent / total or 0
+            lines.append("%6.1f%% %8s %10.3f %10.3f  %s %s"%(share * 100, count,
+                spent * 1000 / count, slowest * 1000, name, "#" * int(round(share * SAMPLE_BAR))))
+            for part, where in self.hottest(name):
+                lines.append("%16.1f%%  %s"%(part * 100, where))
+        return "\n".join(lines)
+
+def start(every=SAMPLE_EVERY, deep=False):
+    rel.check_init()
+    if rel.registrar == rel.pyevent:
+        return rel.log("Sampling disabled in pyevent. Choose epoll, kqueue, poll, or select to enable sampling.")
+    if rel.registrar.sampler is None:
+        rel.registrar.sampler = Sampler(every, deep)
+    return rel.registrar.sampler
+
+def stop():
+    sampler = getattr(rel.registrar, "sampler", None)
+    if sampler is not None:
+        rel.registrar.sampler = None
+    return sampler
+
+def summary(top=SAMPLE_TOP):
+    sampler = getattr(rel.registrar, "sampler", None)
+    return sampler and sampler.summary(top)
+
+def toggle(path=None, every=SAMPLE_EVERY, deep=False):
+    sampler = stop()
+    if sampler is None:
+        rel.log("sampler: started (1 in %s)"%(every,))
+        return start(every, deep)
+    path = path or default_path()
+    with open(path, "w") as f:
+        f.write(sampler.summary() + "\n")
+    rel.log("sampler: wrote summary to %s"%(path,))
+    return path
+
+def on_signal(sig=SAMPLE_SIGNAL, every=SAMPLE_EVERY, deep=False):
+    if sig is not None: # toggle from the loop, not from inside the handler
+        rel.signal(sig, rel.call_soon, lambda : toggle(None, every, deep))
@@ -0,0 +1,33 @@
+from . import rel as rel
+from .registrar import label as label
+from _typeshed import Incomplete
+
+SAMPLE_EVERY: int
+SAMPLE_TOP: int
+SAMPLE_DEEP_TOP: int
+SAMPLE_BAR: int
+SAMPLE_SIGNAL: Incomplete
+
+def default_path(pid: Incomplete | None = ...): ...
+
+class Sampler:
+    every: Incomplete
+    deep: Incomplete
+    countdown: Incomplete
+    samples: int
+    stats: Incomplete
+    profiles: Incomplete
+    profiling: Incomplete
+    def __init__(self, every=..., deep: bool = ...) -> None: ...
+    def gap(self): ...
+    def pick(self): ...
+    def enter(self, listener) -> None: ...
+    def leave(self, listener, duration) -> None: ...
+    def hottest(self, name, top=...): ...
+    def summary(self, top=...): ...
+
+def start(every=..., deep: bool = ...): ...
+def stop(): ...
+def summary(top=...): ...
+def toggle(path: Incomplete | None = ..., every=..., deep: bool = ...): ...
+def on_signal(sig=..., every=..., deep: bool = ...) -> None: ...
@@ -0,0 +1,133 @@
+"""
+This module contains a load-shedding controller driven by loop lag:
+Shedder, start(), stop(), and shed().
+
+### start(high=SHED_HIGH, low=SHED_LOW, hold=SHED_HOLD, priority=SHED_PRIORITY, defer=SHED_DEFER)
+This function attaches a Shedder to the registrar, which follows each
+loop()'s lag (the time it took, sans sleep) as a moving average. Once
+that passes high seconds, the loop is overloaded, and until it has
+stayed under low for hold seconds:
+
+    - designated SocketIOs (see shed()) are unregistered, so listening
+      sockets stop accepting and new work waits in the backlog
+    - due timers with a priority of at least priority (lower runs
+      first, default 0) are pushed back by defer seconds
+    - util.emit("overload", True, lag) is called on the way in, and
+      util.emit("overload", False, lag) on the way out
+
+so connections already in hand keep their latency while a spike passes.
+Meanwhile, a Timer re-checks every SHED_CHECK seconds, so the loop
+keeps going even if the held listeners were all it had.
+Usually enabled via:
+
+    rel.initialize(options=["shed"])
+
+### shed(listener)
+This function designates a SocketIO (or anything with a listener,
+like a net.Acceptor) to be unregistered while overloaded:
+
+    shed(listen_accept(server_sock, on_conn))
+"""
+
+from . import rel
+from .util import Basic, emit
+
+SHED_HIGH = 0.1
+SHED_LOW = 0.02
+SHED_HOLD = 1
+SHED_PRIORITY = 1
+SHED_DEFER = 1
+SHED_CHECK = 0.1
+SHED_ALPHA = 0.25 # weight of the latest loop in the moving average
+
+class Shedder(Basic):
+    def __init__(self, registrar, high=SHED_HIGH, low=SHED_LOW, hold=SHED_HOLD, priority=SHED_PRIORITY, defer=SHED_DEFER):
+        self.registrar = registrar
+        self.high = high
+        self.low = low
+        self.hold = hold
+        self.priority = priority
+        self.defer = defer
+        self.lag = 0
+        self.calm = None
+        self.overloaded = False
+        self.listeners = []
+        self.ticker = None
+        self.sheds = 0
+        self.deferred = 0
+
+    def __repr__(self):
+        return '<Shedder Object | Lag:"%s" | Overloaded:"%s">'%(self.lag, self.overloaded)
+
+    def measure(self, lag):
+        self.lag += (lag - self.lag) * SHED_ALPHA
+        if self.lag > self.high:
+            self.calm = None
+            self.overloaded or self.overload()
+        elif self.overloaded:
+            if self.lag > self.low:
+                self.calm = None
+            elif self.calm is None:
+                self.calm = self.registrar.now()
+            elif self.registrar.now() - self.calm >= self.hold:
+                return self.recover()
+            self.pause() # in case a Bucket resumed one meanwhile
+
+    def overload(self):
+        self.log("overloaded -- lag:", self.lag)
+        self.overloaded = True
+        self.sheds += 1
+        self.pause()
+        self.ticker = self.registrar.timeout(SHED_CHECK, lambda : self.overloaded)
+        emit("overload", True, self.lag)
+
+    def recover(self):
+        self.log("recovered -- lag:", self.lag)
+        self.overloaded = False
+        self.calm = None
+        self.ticker and self.ticker.delete()
+        self.ticker = None
+        for listener in self.listeners:
+            listener.suspended and listener.resume()
+        emit("overload", False, self.lag)
+
+    def pause(self):
+        self.listeners = [listener for listener in self.listeners if listener.active]
+        for listener in self.listeners:
+            listener.suspended or listener.hold()
+
+    def shed(self, listener):
+        listener = getattr(listener, "listener", listener)
+        self.listeners.append(listener)
+        self.overloaded and self.pause()
+        return listener
+
+    def sift(self, due, t):
+        keep = []
+        for timer in due:
+            if timer.priority < self.priority:
+                keep.append(timer)
+            else: # not now -- try again in a bit
+                timer.expiration = t + self.defer
+                self.registrar.add_timer(timer)
+                self.deferred += 1
+        return keep
+
+def start(high=SHED_HIGH, low=SHED_LOW, hold=SHED_HOLD, priority=SHED_PRIORITY, defer=SHED_DEFER):
+    rel.check_init()
+    if rel.registrar == rel.pyevent:
+        return rel.log("Shedding disabled in pyevent. Choose epoll, kqueue, poll, or select to enable shedding.")
+    if rel.registrar.shedder is None:
+        rel.registrar.shedder = Shedder(rel.registrar, high, low, hold, priority, defer)
+    return rel.registrar.shedder
+
+def stop():
+    shedder = getattr(rel.registrar, "shedder", None)
+    if shedder is not None:
+        shedder.overloaded and shedder.recover()
+        rel.registrar.shedder = None
+    return shedder
+
+def shed(listener):
+    shedder = start()
+    return shedder and shedder.shed(listener)
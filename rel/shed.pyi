@@ -0,0 +1,37 @@
+from . import rel as rel
+from .util import Basic as Basic, emit as emit
+from _typeshed import Incomplete
+
+SHED_HIGH: float
+SHED_LOW: float
+SHED_HOLD: int
+SHED_PRIORITY: int
+SHED_DEFER: int
+SHED_CHECK: float
+SHED_ALPHA: float
+
+class Shedder(Basic):
+    registrar: Incomplete
+    high: Incomplete
+    low: Incomplete
+    hold: Incomplete
+    priority: Incomplete
+    defer: Incomplete
+    lag: int
+    calm: Incomplete
+    overloaded: bool
+    listeners: Incomplete
+    ticker: Incomplete
+    sheds: int
+    deferred: int
+    def __init__(self, registrar, high=..., low=..., hold=..., priority=..., defer=...) -> None: ...
+    def measure(self, lag): ...
+    def overload(self) -> None: ...
+    def recover(self) -> None: ...
+    def pause(self) -> None: ...
+    def shed(self, listener): ...
+    def sift(self, due, t): ...
+
+def start(high=..., low=..., hold=..., priority=..., defer=...): ...
+def stop(): ...
+def shed(listener): ...
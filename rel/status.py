@@ -0,0 +1,155 @@
+"""
+This module contains a live status endpoint: snapshot(), serve(),
+and fetch().
+
+### snapshot(top=10)
+This function returns a compact, JSON-ready summary of the running
+registrar: its type, event and timer counts, loop lag, the top slowest
+callbacks (by max duration), and the unsent buffwrite() bytes per fd.
+
+### serve(path=None, port=None)
+This function opens a status socket, handled by rel's own registrar,
+which answers every connection with a snapshot() (via buffwrite(),
+giving up after TIMEOUT seconds) and hangs up. With a
+port, it listens on localhost; otherwise, on a UNIX socket at path
+(default: rel-[pid].sock in $XDG_RUNTIME_DIR, or else in a private
+rel-[uid] directory in the temp directory). Whatever is already at
+path is only replaced if it's a socket of ours (left over from a dead
+process, say). It also turns on callback timing (for the slow callback
+list). Usually enabled via:
+
+    rel.initialize(options=["status"])
+
+### fetch(path=None, port=None)
+This function retrieves a snapshot from a (possibly remote-process)
+status endpoint. The rtop console script polls it.
+"""
+
+import os, stat, socket, json, time, tempfile
+from . import rel
+from .buff import buffwrite, when_flushed, release_buff
+
+TOP = 10
+TIMEOUT = 1
+server = None
+
+def runtime_dir():
+    path = os.environ.get("XDG_RUNTIME_DIR")
+    if path:
+        return path
+    path = os.path.join(tempfile.gettempdir(), "rel-%s"%(os.getuid(),))
+    os.makedirs(path, 0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError("%s is not a private directory of ours"%(path,))
+    return path
+
+def default_path(pid=None):
+    return os.path.join(runtime_dir(), "rel-%s.sock"%(pid or os.getpid(),))
+
+def ours(path): # a socket we may unlink -- nobody else's file
+    try:
+        info = os.lstat(path)
+    except FileNotFoundError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+def snapshot(top=TOP):
+    rel.check_init()
+    reg = rel.registrar
+    status = {
+        "pid": os.getpid(),
+        "time": time.time(),
+        "registrar": reg.__class__.__name__
+    }
+    if reg == rel.pyevent:
+        return status
+    from .buff import queued
+    status["counts"] = reg.report()
+    status["slow"] = [[name] + stat for (name, stat) in
+        sorted(reg.stats.items(), key=lambda s : s[1][2], reverse=True)[:top]]
+    status["buffers"] = queued()
+    return status
+
+class StatusServer(object):
+    def __init__(self, path=None, port=None):
+        self.path = path
+        self.port = port
+        if port is None:
+            self.path = path or default_path()
+            if ours(self.path): # stale -- anything else, bind() refuses
+                os.unlink(self.path)
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.sock.bind(self.path)
+            except OSError:
+                self.sock.close()
+                raise
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind(("127.0.0.1", port))
+            self.port = self.sock.getsockname()[1]
+        self.sock.listen(8)
+        self.sock.setblocking(False)
+        self.listener = rel.read(self.sock, self.answer)
+        self.listener.persistent()
+        rel.registrar.timing = True
+
+    def __repr__(self):
+        return '<StatusServer Object | Address:"%s">'%(self.path or self.port,)
+
+    def answer(self):
+        try:
+            conn, addr = self.sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return True
+        data = json.dumps(snapshot(), separators=(",", ":")).encode()
+        conn.setblocking(False) # a stalled client mustn't stall the loop
+        deadline = rel.timeout(TIMEOUT, self.hangup, conn, "timed out")
+        def __done(reason=None):
+            deadline.delete()
+            self.hangup(conn, reason)
+        buffwrite(conn, data, None, __done)
+        when_flushed(conn, __done)
+        return True
+
+    def hangup(self, conn, reason=None):
+        reason and rel.log("status: abandoning connection: %s"%(reason,))
+        release_buff(conn)
+        conn.close()
+
+    def close(self):
+        self.listener.delete()
+        self.sock.close()
+        rel.registrar.timing = False
+        if self.path and ours(self.path):
+            os.unlink(self.path)
+
+def serve(path=None, port=None):
+    global server
+    stop()
+    server = StatusServer(path, port)
+    return server
+
+def stop():
+    global server
+    if server:
+        server.close()
+        server = None
+
+def fetch(path=None, port=None, host="127.0.0.1"):
+    if port is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(TIMEOUT)
+        sock.connect(path or default_path())
+    else:
+        sock = socket.create_connection((host, port), TIMEOUT)
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    sock.close()
+    return json.loads(b"".join(chunks).decode())
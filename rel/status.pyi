@@ -0,0 +1,26 @@
+from . import rel as rel
+from .buff import buffwrite as buffwrite, release_buff as release_buff, when_flushed as when_flushed
+from _typeshed import Incomplete
+
+TOP: int
+TIMEOUT: int
+server: Incomplete
+
+def runtime_dir(): ...
+def default_path(pid: Incomplete | None = ...): ...
+def ours(path): ...
+def snapshot(top=...): ...
+
+class StatusServer:
+    path: Incomplete
+    port: Incomplete
+    sock: Incomplete
+    listener: Incomplete
+    def __init__(self, path: Incomplete | None = ..., port: Incomplete | None = ...) -> None: ...
+    def answer(self): ...
+    def hangup(self, conn, reason: Incomplete | None = ...) -> None: ...
+    def close(self) -> None: ...
+
+def serve(path: Incomplete | None = ..., port: Incomplete | None = ...): ...
+def stop() -> None: ...
+def fetch(path: Incomplete | None = ..., port: Incomplete | None = ..., host: str = ...): ...
@@ -0,0 +1,94 @@
+"""
+This module contains cooperative background tasks: Task and spawn_task().
+
+### spawn_task(gen, on_done=None, on_error=None, budget=TASK_BUDGET)
+This function runs a generator on the loop, a time slice at a time.
+Each loop() pass (via call_soon()), the generator is advanced until it
+has used up budget seconds, and then the pass goes on to I/O and
+timers as usual -- so a long job runs alongside sockets, instead of
+blocking them until it's done, and without threads or locks. Each
+yield is a point where the task may be put aside, and whatever it
+yields is kept as its progress:
+
+    def rebuild(rows):
+        for i, row in enumerate(rows):
+            index(row)
+            yield i / len(rows)
+
+    task = spawn_task(rebuild(rows), on_done)
+
+When the generator returns, on_done(result) is called with its return
+value. If it raises, on_error(error) is called (or, without on_error,
+the error propagates out of the loop, like any callback's). The Task
+keeps progress, steps (number of yields), and elapsed (seconds spent),
+and cancel() stops it (closing the generator, so its finally blocks
+run) without calling on_done.
+"""
+
+import time
+from . import rel
+from .util import Basic
+
+TASK_BUDGET = 0.005
+
+class Task(Basic):
+    def __init__(self, gen, on_done=None, on_error=None, budget=TASK_BUDGET):
+        self.gen = gen
+        self.on_done = on_done
+        self.on_error = on_error
+        self.budget = budget
+        self.subname = getattr(gen, "__qualname__", gen.__class__.__name__)
+        self.progress = None
+        self.steps = 0
+        self.elapsed = 0
+        self.result = None
+        self.error = None
+        self.done = False
+        self.cancelled = False
+        rel.call_soon(self.step)
+
+    def __repr__(self):
+        return '<Task Object | Generator:"%s">'%(self.subname,)
+
+    def step(self):
+        if self.done:
+            return
+        start = time.perf_counter()
+        deadline = start + self.budget
+        try:
+            while True:
+                self.progress = next(self.gen)
+                self.steps += 1
+                if time.perf_counter() >= deadline:
+                    break
+        except StopIteration as e:
+            self.elapsed += time.perf_counter() - start
+            return self.finish(e.value)
+        except Exception as e:
+            self.elapsed += time.perf_counter() - start
+            return self.fail(e)
+        self.elapsed += time.perf_counter() - start
+        rel.call_soon(self.step) # the rest next pass, after I/O and timers
+
+    def finish(self, result):
+        self.log("done after", self.steps, "steps")
+        self.done = True
+        self.result = result
+        self.on_done and self.on_done(result)
+
+    def fail(self, error):
+        self.log("failed:", error)
+        self.done = True
+        self.error = error
+        if not self.on_error:
+            raise error
+        self.on_error(error)
+
+    def cancel(self):
+        if not self.done:
+            self.log("cancel")
+            self.done = self.cancelled = True
+            self.gen.close()
+
+def spawn_task(gen, on_done=None, on_error=None, budget=TASK_BUDGET):
+    return Task(gen, on_done, on_error, budget)
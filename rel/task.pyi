@@ -0,0 +1,26 @@
+from . import rel as rel
+from .util import Basic as Basic
+from _typeshed import Incomplete
+
+TASK_BUDGET: float
+
+class Task(Basic):
+    gen: Incomplete
+    on_done: Incomplete
+    on_error: Incomplete
+    budget: Incomplete
+    subname: Incomplete
+    progress: Incomplete
+    steps: int
+    elapsed: int
+    result: Incomplete
+    error: Incomplete
+    done: bool
+    cancelled: bool
+    def __init__(self, gen, on_done: Incomplete | None = ..., on_error: Incomplete | None = ..., budget=...) -> None: ...
+    def step(self): ...
+    def finish(self, result) -> None: ...
+    def fail(self, error) -> None: ...
+    def cancel(self) -> None: ...
+
+def spawn_task(gen, on_done: Incomplete | None = ..., on_error: Incomplete | None = ..., budget=...): ...
@@ -11,18 +11,44 @@ Sample usage:
     rel\test.py -v
     rel\test.py -v EventTest.test_exception EventTest.test_timeout
     ... etc.
+
+Timers run on rel's virtual clock (see registrar.set_virtual()), so
+the suite finishes in milliseconds instead of waiting in real time.
 """
 
 from . import rel
+from .harness import Harness, SocketPair
+from .registrar import TOMBSTONE_MAX, SLEEP_TURBO
+from . import util
+from . import status
+from . import probe
+from .net import listen_accept, Datagram, connect, Pool
+from .buff import buffwrite, throttle_buff, release_buff
+from . import tls
+from .process import spawn_process
+from .task import spawn_task
+from . import trace
+from . import sampler
+from . import buff
+from . import shed
 rel.override()
 
+import errno
 import glob
+import json
 import os
+import select
+import shutil
+import ssl
+import subprocess
+import socket
+import tempfile
 import signal
 import sys
 import _thread
 import time
 import unittest
+import weakref
 
 """
 # skip code, disabled due to odd raise in Cython code
@@ -45,6 +71,10 @@ if possible_build_dir:
 
 import event
 
+BUFF_SOAK = 20000 # connections
+IMPORT_BUDGET = 100000 # microseconds, cumulative, for "import rel" (python -X importtime)
+IMPORT_LAZY = ('pprint', 'datetime', 'threading', 'ssl', 'subprocess', 'event', 'rel.buff', 'rel.net', 'rel.process', 'rel.task', 'rel.tools')
+
 class EventTest(unittest.TestCase):
 
     def skip(self, reason):
@@ -66,14 +96,18 @@ class EventTest(unittest.TestCase):
 
     def setUp(self):
         self.call_back_ran = False
+        rel.set_virtual(True)
         event.init()
 
+    def tearDown(self):
+        rel.set_virtual(False)
+
     def test_timeout(self):
         def __timeout_cb(ev, handle, evtype, ts):
-            now = time.monotonic()
+            now = rel.clock()
             self.call_back_ran = True
             assert int(now - ts['start']) == ts['secs'], 'timeout failed'
-        ts = {'start': time.monotonic(), 'secs': 5}
+        ts = {'start': rel.clock(), 'secs': 5}
         ev = event.event(__timeout_cb, arg=ts)
         ev.add(ts['secs'])
         event.dispatch()
@@ -82,9 +116,9 @@ class EventTest(unittest.TestCase):
     def test_timeout2(self):
         def __timeout2_cb(start, secs):
             self.call_back_ran = True
-            dur = int(time.monotonic() - start)
+            dur = int(rel.clock() - start)
             assert dur == secs, 'timeout2 failed'
-        event.timeout(5, __timeout2_cb, time.monotonic(), 5)
+        event.timeout(5, __timeout2_cb, rel.clock(), 5)
         event.dispatch()
         self.assertTrue(self.call_back_ran, 'call back did not run')
 
@@ -95,16 +129,66 @@ class EventTest(unittest.TestCase):
         timer_delay = 2
         def _timer_cb():
             self.call_back_ran = True
-            delay = int(time.monotonic() - loop_start)
+            delay = int(rel.clock() - loop_start)
             assert delay == timer_delay, 'timers failed'
 
         timer = event.timeout(timer_delay * 2, _timer_cb)
         timer.delete()
         timer.add(timer_delay)
-        loop_start = time.monotonic()
+        loop_start = rel.clock()
+        event.dispatch()
+        self.assertTrue(self.call_back_ran, 'call back did not run')
+
+    def test_slack(self):
+        """
+        Check that timers within the slack window fire together.
+        """
+        fired = []
+        start = rel.clock()
+        grid = (int(start / 10) + 2) * 10
+        for early in (1, 2, 3):
+            event.timeout(grid - start - early, lambda : fired.append(rel.clock()), slack=10)
+        event.dispatch()
+        self.assertEqual(fired, [grid] * 3)
+
+    def test_lazy_cancel(self):
+        """
+        Check that cancelled timers are skipped and eventually compacted.
+        """
+        def __cancelled_cb():
+            raise NotImplementedError('cancelled timer fired!')
+        def __live_cb():
+            self.call_back_ran = True
+        timers = [event.timeout(10, __cancelled_cb) for i in range(1000)]
+        event.timeout(20, __live_cb)
+        for timer in timers:
+            timer.delete()
+        status = rel.report()
+        self.assertEqual(status['timers'], 1)
+        self.assertTrue(status['compactions'] > 0, 'no compaction')
+        self.assertTrue(status['tombstones'] <= TOMBSTONE_MAX)
         event.dispatch()
         self.assertTrue(self.call_back_ran, 'call back did not run')
 
+    def test_rearm_compact(self):
+        """
+        Check that re-arming pending timers (touching a deadline) compacts too.
+        """
+        timer = event.timeout(10, lambda : None)
+        pair = socket.socketpair()
+        sockio = event.read(pair[0], lambda : None)
+        for i in range(5000):
+            timer.add(10)
+            sockio.add(10)
+        status = rel.report()
+        self.assertEqual(status['timers'], 2)
+        self.assertTrue(status['compactions'] > 0, 'no compaction')
+        self.assertTrue(len(rel.registrar.theap) <= TOMBSTONE_MAX + 2)
+        sockio.delete()
+        timer.delete()
+        for sock in pair:
+            sock.close()
+
     def test_signal(self):
         if not hasattr(signal, 'SIGUSR1'):
             self.skip('signal.SIGUSR1 missing (probably Windows)')
@@ -187,6 +271,9 @@ class EventTest(unittest.TestCase):
         self.assertRaises(Exception, event.dispatch)
 
     def test_thread(self):
+        # real threads sleep in real time -- use the system clock, scaled down
+        rel.set_virtual(False)
+        unit = 0.25
         self.call_back_ran_a = False
         self.call_back_ran_b = False
 
@@ -197,15 +284,777 @@ class EventTest(unittest.TestCase):
         def __time_thread(count, d):
             self.call_back_ran_b = True
             for i in range(count):
-                time.sleep(1)
+                time.sleep(unit)
                 d['count'] += 1
         d = {'count': 0}
         _thread.start_new_thread(__time_thread, (3, d))
-        event.timeout(4, __time_cb, d)
+        event.timeout(5 * unit, __time_cb, d) # two units of slack for a loaded box
         event.dispatch()
         self.assertTrue(self.call_back_ran_a, 'call back a did not run')
         self.assertTrue(self.call_back_ran_b, 'call back b did not run')
 
+class HarnessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.harness = Harness()
+        self.harness.start()
+
+    def tearDown(self):
+        self.harness.stop()
+
+    def test_virtual_clock(self):
+        fired = []
+        event.timeout(3600, lambda : fired.append(rel.clock()))
+        start = time.monotonic()
+        elapsed = self.harness.run(7200)
+        self.assertTrue(time.monotonic() - start < 1, 'virtual time too slow')
+        self.assertEqual(elapsed, 7200)
+        self.assertEqual(len(fired), 1)
+        now = rel.clock()
+        rel.set_virtual(True) # already on -- no reseed
+        self.assertEqual(rel.clock(), now)
+        rel.set_virtual(False)
+        rel.set_virtual(True) # ahead of the system clock -- no rewind
+        self.assertEqual(rel.clock(), now)
+
+    def test_want_shared(self):
+        got, wrote = [], []
+        pair = self.harness.pair()
+        reader = event.read(pair.local, lambda : got.append(pair.local.recv(16)) or True)
+        event.write(pair.local, lambda : wrote.append(1))
+        reader.want("write") # the writer is spoken for -- ride along on it
+        self.assertTrue(reader.suspended)
+        self.assertEqual(rel.report()['timers'], 0) # woken by the event, not by polling
+        pair.send(b'x')
+        self.harness.run(until=lambda : got)
+        self.assertEqual((got, wrote), ([b'x'], [1]))
+        self.assertFalse(reader.suspended)
+        reader.delete()
+
+    def test_socketpair(self):
+        received = []
+        def __echo_cb(sock):
+            data = sock.recv(1024)
+            received.append(data)
+            sock.send(data.upper())
+            return True
+        pair = self.harness.pair()
+        event.read(pair.local, __echo_cb, pair.local)
+        pair.send(b'hi niels')
+        self.harness.run(until=lambda : received)
+        self.assertEqual(received, [b'hi niels'])
+        self.assertEqual(pair.recv(), b'HI NIELS')
+
+    def test_priority(self):
+        order = []
+        def __read_cb(name, sock):
+            order.append(name)
+            sock.recv(1024)
+        bulk, control = self.harness.pair(), self.harness.pair()
+        event.read(bulk.local, __read_cb, 'bulk', bulk.local)
+        event.read(control.local, __read_cb, 'control', control.local, priority=-1)
+        event.timeout(0, order.append, 'heartbeat', priority=-2)
+        bulk.send(b'lots of data')
+        control.send(b'shutdown')
+        self.harness.run(until=lambda : len(order) == 3)
+        self.assertEqual(order, ['heartbeat', 'control', 'bulk'])
+
+    def test_drain(self):
+        got = []
+        def __data_cb(data):
+            got.append(data)
+            return data
+        pair = self.harness.pair()
+        event.read(pair.local, __data_cb, drain=8)
+        for chunk in (b'one ', b'two ', b'three'):
+            pair.send(chunk)
+        self.harness.run(until=lambda : len(got) == 2)
+        self.assertEqual(got, [b'one two ', b'three'])
+        pair.hangup()
+        self.harness.run(until=lambda : len(got) == 3)
+        self.assertEqual(got[-1], b'')
+
+    def test_throttle(self):
+        got = []
+        pair = self.harness.pair()
+        reader = event.read(pair.local, lambda data : got.append(data) or True, drain=65536)
+        reader.throttle(rel.bucket(1000))
+        pair.send(b'x' * 5000)
+        elapsed = self.harness.run(until=lambda : sum(map(len, got)) == 5000)
+        self.assertTrue(3.9 < elapsed < 4.1, 'read throttle off: %s'%(elapsed,))
+        self.assertTrue(len(got) > 10)
+        buffwrite(pair.local, b'y' * 40960, lambda sock, data : sock.sendall(data), None)
+        throttle_buff(pair.local, rel.bucket(8192))
+        received = []
+        elapsed = self.harness.run(until=lambda : received.append(pair.recv()) or sum(map(len, received)) == 40960)
+        self.assertTrue(3.5 < elapsed < 4.5, 'write throttle off: %s'%(elapsed,))
+        release_buff(pair.local)
+        small = rel.bucket(1000) # less than a WMAX chunk
+        buffwrite(pair.local, b'w' * 5000, None, None)
+        throttle_buff(pair.local, small)
+        received, lows = [], []
+        elapsed = self.harness.run(until=lambda : lows.append(small.tokens) or received.append(pair.recv()) or sum(map(len, received)) == 5000)
+        self.assertTrue(3.5 < elapsed < 4.5, 'small write throttle off: %s'%(elapsed,))
+        self.assertTrue(min(lows) >= 0, 'bucket overdrawn: %s'%(min(lows),))
+        release_buff(pair.local)
+        plain = event.read(pair.local, lambda : got.append(pair.local.recv(5000)) or True)
+        self.assertRaises(ValueError, plain.throttle, rel.bucket(1000))
+        rel.limit("read", 1000)
+        pair.send(b'z' * 5000)
+        self.harness.run(until=lambda : got[-1] == b'z' * 5000)
+        self.assertFalse(plain.suspended) # never charged, so never held back
+        rel.limit("read", None)
+        plain.delete()
+
+    def test_drain_shutdown(self):
+        done = []
+        pair = self.harness.pair()
+        event.read(pair.local, lambda : True).persistent()
+        buffwrite(pair.local, b'z' * 16384, lambda sock, data : sock.sendall(data), None)
+        throttle_buff(pair.local, rel.bucket(8192))
+        rel.drain(10, done.append)
+        self.assertEqual(rel.report()['reads'], 0)
+        self.assertTrue(rel.report()['draining']['unsent'] > 0)
+        received = []
+        elapsed = self.harness.run(until=lambda : received.append(pair.recv()) or done)
+        self.assertEqual(done, [0])
+        self.assertEqual(sum(map(len, received)), 16384)
+        self.assertTrue(elapsed < 3, 'drain took %s'%(elapsed,))
+        self.assertEqual(rel.report()['draining'], None)
+        release_buff(pair.local)
+        pair = self.harness.pair()
+        buffwrite(pair.local, b'z' * 16384, lambda sock, data : sock.sendall(data), None)
+        throttle_buff(pair.local, rel.bucket(1024))
+        rel.drain(2, done.append)
+        received = []
+        self.harness.run(until=lambda : received.append(pair.recv()) or len(done) == 2)
+        self.assertTrue(done[1] > 0)
+        received.append(pair.recv())
+        self.assertEqual(sum(map(len, received)) + done[1], 16384)
+        self.assertEqual(rel.report()['writes'], 0)
+        release_buff(pair.local)
+        pair = self.harness.pair()
+        buffwrite(pair.local, b'z' * 16384, lambda sock, data : sock.sendall(data), None)
+        throttle_buff(pair.local, rel.bucket(1024))
+        rel.drain(10, done.append)
+        rel.abort()
+        self.assertEqual(rel.report()['draining'], None)
+        self.harness.run(1)
+        self.assertEqual(len(done), 2) # aborted -- no drain callback
+        release_buff(pair.local)
+
+    def test_buff_cleanup(self):
+        pair = self.harness.pair()
+        buffwrite(pair.local, b'v' * 10000, None, None)
+        writer = buff.writings[pair.local]
+        self.harness.run(until=lambda : not writer.writes)
+        self.assertEqual(len(pair.recv()), 10000)
+        self.assertEqual((writer.listeners, writer.sock), ({}, None))
+        self.assertEqual(writer.queued(), 0)
+        self.assertEqual(rel.report()['writes'], 0)
+        buffwrite(pair.local, b'v', None, None) # wakes right back up
+        self.assertEqual(writer.sock, pair.local)
+        self.harness.run(until=lambda : not writer.writes)
+        errors = []
+        pair.remote.close() # EPIPE on the next send
+        buffwrite(pair.local, b'v', None, errors.append)
+        self.harness.run(until=lambda : errors)
+        self.assertFalse(pair.local in buff.writings)
+        pair = self.harness.pair()
+        buffwrite(pair.local, b'v' * 1000000, None, None) # more than the socket takes
+        writer = buff.writings[pair.local]
+        self.harness.run(1)
+        buff.set_weak(False)
+        try:
+            pair.local.close()
+            buff.sweep() # held strongly -- closed sockets need sweeping out
+            self.assertFalse(pair.local in buff.writings)
+            self.assertEqual((writer.writes, writer.listeners), ([], {}))
+        finally:
+            buff.set_weak()
+
+    def test_buff_soak(self):
+        writers = []
+        for i in range(BUFF_SOAK):
+            pair = SocketPair()
+            buffwrite(pair.local, b's' * 100, None, None)
+            writers.append(weakref.ref(buff.writings[pair.local]))
+            self.harness.run(until=lambda : pair.recv())
+            pair.close()
+        del pair
+        # no gc.collect() -- idle writers are freed by refcounting alone
+        self.assertEqual(len(buff.writings), 0)
+        self.assertEqual([w for w in writers if w() is not None], [])
+        pair = self.harness.pair() # onerror releasing too is fine
+        pair.hangup()
+        buffwrite(pair.local, b'x', None, lambda msg : release_buff(pair.local))
+        self.harness.run(until=lambda : pair.local not in buff.writings)
+
+    def test_shed(self):
+        got = []
+        states = []
+        pair = self.harness.pair()
+        reader = event.read(pair.local, lambda : got.append(pair.local.recv(100)) or True)
+        shedder = shed.start(hold=5, defer=10)
+        shedder.shed(reader)
+        util.listen('overload', lambda overloaded, lag : states.append(overloaded))
+        start = self.harness.now()
+        shedder.measure(1) # one bad pass
+        self.assertEqual((shedder.overloaded, states), (True, [True]))
+        self.assertTrue(rel.registrar.loop(), 'loop quit with its only listener held')
+        event.timeout(1, got.append, 'urgent')
+        event.timeout(1, got.append, 'lazy', priority=1)
+        pair.send(b'x')
+        self.harness.run(2)
+        self.assertEqual(got, ['urgent'])
+        self.assertEqual(rel.report()['reads'], 0)
+        self.harness.run(until=lambda : len(states) == 2) # calm for hold seconds, with nothing else registered
+        self.assertEqual(states, [True, False])
+        self.harness.run(until=lambda : len(got) == 2)
+        self.assertEqual(got, ['urgent', b'x'])
+        self.harness.run(until=lambda : len(got) == 3)
+        self.assertTrue(self.harness.now() - start >= 11, 'lazy timer not deferred')
+        self.assertEqual((shedder.sheds, shedder.deferred), (1, 1))
+        shed.stop()
+        util.listeners.pop('overload')
+
+    def test_task(self):
+        def __job(n):
+            total = 0
+            for i in range(n):
+                total += i
+                yield i
+            return total
+        def __forever(stopped):
+            try:
+                while True:
+                    yield
+            finally:
+                stopped.append(True)
+        results = []
+        seen = []
+        pair = self.harness.pair()
+        task = spawn_task(__job(200000), results.append, budget=0.001)
+        event.read(pair.local, lambda : seen.append(task.done) or pair.local.recv(100) and None)
+        pair.send(b'x')
+        self.harness.run(until=lambda : results)
+        self.assertEqual(seen, [False]) # the read got in while the task was running
+        self.assertEqual(results, [sum(range(200000))])
+        self.assertEqual((task.steps, task.progress), (200000, 199999))
+        self.assertTrue(task.elapsed > 0)
+        self.assertFalse('200000' in repr(task)) # stable, so stats can aggregate by it
+        stopped = []
+        task = spawn_task(__forever(stopped))
+        self.harness.run(until=lambda : task.steps)
+        task.cancel()
+        self.assertEqual((stopped, task.cancelled), ([True], True))
+        self.harness.run(1)
+        self.assertEqual(rel.report()['soon'], 0)
+        errors = []
+        task = spawn_task((1 / 0 for i in range(1)), on_error=errors.append)
+        self.harness.run(until=lambda : errors)
+        self.assertTrue(isinstance(task.error, ZeroDivisionError))
+
+    def test_call_soon(self):
+        calls = []
+        def __later(n):
+            calls.append(n)
+            n < 3 and rel.call_soon(__later, n + 10)
+        rel.call_soon(__later, 1)
+        rel.call_soon(__later, 2)
+        self.assertEqual(rel.report()['timers'], 0)
+        rel.loop()
+        self.assertEqual(calls, [1, 2])
+        rel.loop()
+        self.assertEqual(calls, [1, 2, 11, 12])
+        self.assertEqual(rel.report()['soon'], 0)
+        rel.registrar.timing = True # stats are kept per callback, not per callable object
+        try:
+            for i in range(50):
+                rel.call_soon(lambda : None)
+                rel.call_soon(__later, 5)
+            rel.loop()
+        finally:
+            rel.registrar.timing = False
+        self.assertEqual(sorted(n.split('.')[-1] for n in rel.registrar.stats), ['<lambda>', '__later'])
+        idled = []
+        pair = self.harness.pair()
+        event.read(pair.local, lambda : pair.local.recv(1024) and True)
+        rel.idle(lambda : idled.append(rel.clock()) or len(idled) < 3)
+        pair.send(b'busy')
+        start = rel.clock()
+        rel.loop()
+        self.assertEqual(idled, [])
+        elapsed = self.harness.run(until=lambda : rel.report()['idle'] == 0)
+        self.assertEqual(len(idled), 3)
+        self.assertEqual(elapsed, 0)
+        rel.idle(lambda : idled.append(None) or True) # forever
+        rel.set_virtual(False)
+        try:
+            start = time.monotonic()
+            for i in range(3):
+                rel.loop()
+            elapsed = time.monotonic() - start
+        finally:
+            rel.set_virtual(True)
+        self.assertEqual(len(idled), 6)
+        self.assertTrue(elapsed >= 3 * SLEEP_TURBO, 'idle loop spun without sleeping')
+
+    def test_trace(self):
+        def __tick():
+            return True
+        path = os.path.join(tempfile.gettempdir(), 'rel-test-trace-%s.json'%(os.getpid(),))
+        tracer = trace.start(size=64)
+        event.timeout(1, __tick)
+        pair = self.harness.pair()
+        event.read(pair.local, lambda : pair.local.recv(1024) and True)
+        pair.send(b'traced')
+        buffwrite(pair.local, b'w' * 100, None, None)
+        self.harness.run(100)
+        self.assertEqual(len(tracer.events), 64)
+        kept = [e[1] for e in tracer.events if e[0] == 'callback']
+        self.assertTrue(kept and all(type(name) is str for (name, fields) in kept)) # nothing live
+        try:
+            self.assertEqual(trace.dump(path), path)
+            with open(path) as f:
+                events = json.load(f)['traceEvents']
+        finally:
+            os.path.exists(path) and os.unlink(path)
+        self.assertEqual(len(events), 64)
+        self.assertTrue(all(e['ph'] in ('X', 'C') for e in events))
+        timers = [e for e in events if e['name'].endswith('__tick')]
+        self.assertTrue(timers and all('late' in e['args'] for e in timers))
+        self.assertTrue([e for e in events if e['name'] == 'poll'])
+        self.assertIs(trace.stop(), tracer)
+        tracer.clear()
+        self.harness.run(5)
+        self.assertEqual(len(tracer.events), 0)
+        pair.recv()
+        trace.start()
+        pair.send(b'again')
+        buffwrite(pair.local, b'w' * 100, None, None)
+        self.harness.run(until=lambda : pair.recv())
+        names = [e['name'] for e in rel.registrar.tracer.export()['traceEvents']]
+        self.assertTrue('read %s'%(pair.local.fileno(),) in names, names)
+        self.assertTrue('buffwrite' in names)
+
+    def test_sampler(self):
+        def __busy():
+            sum(range(20000))
+            return True
+        def __quick():
+            return True
+        event.timeout(1, __busy)
+        event.timeout(1, __quick)
+        prof = sampler.start(every=3, deep=True)
+        self.harness.run(60)
+        self.assertTrue(25 <= prof.samples <= 55, prof.samples) # 120 callbacks, 1 in 3 on average
+        names = sorted(prof.stats)
+        self.assertTrue(len(names) >= 2)
+        self.assertEqual(sum(prof.stats[n][0] for n in names), prof.samples)
+        report = sampler.summary()
+        lines = report.splitlines()
+        self.assertTrue('__busy' in lines[2], report)
+        self.assertTrue('#' in lines[2])
+        self.assertTrue([l for l in lines if '(__busy)' in l or '<built-in' in l], report)
+        path = os.path.join(tempfile.gettempdir(), 'rel-test-profile-%s.txt'%(os.getpid(),))
+        try:
+            self.assertEqual(sampler.toggle(path), path)
+            with open(path) as f:
+                self.assertEqual(f.read().strip(), report)
+        finally:
+            os.path.exists(path) and os.unlink(path)
+        self.assertEqual(sampler.summary(), None)
+        self.assertTrue(sampler.toggle(path) is rel.registrar.sampler)
+        sampler.stop()
+
+    def test_wheel(self):
+        expired = []
+        def __read_cb(sock):
+            sock.recv(1024)
+            return True
+        idle = rel.wheel(10)
+        pair = self.harness.pair()
+        event.read(pair.local, __read_cb, pair.local).watch(idle, expired.append, 'idle')
+        self.harness.run(8)
+        pair.send(b'still here')
+        self.harness.run(8)
+        self.assertEqual(expired, [])
+        self.harness.run(8)
+        self.assertEqual(expired, ['idle'])
+        self.assertEqual(len(idle), 0)
+
+    def test_status(self):
+        def __slow_cb():
+            return True
+        path = os.path.join(tempfile.gettempdir(), 'rel-test-%s.sock'%(os.getpid(),))
+        server = status.serve(path)
+        event.timeout(1, __slow_cb)
+        self.harness.run(3)
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        client.setblocking(False)
+        received = []
+        def __eof():
+            try:
+                chunk = client.recv(65536)
+            except BlockingIOError:
+                return False
+            received.append(chunk)
+            return not chunk
+        self.harness.run(until=__eof) # answered from the loop, without blocking it
+        data = b''.join(received)
+        client.close()
+        status.stop()
+        snap = json.loads(data.decode())
+        self.assertEqual(snap['registrar'], rel.registrar.__class__.__name__)
+        self.assertEqual(snap['counts']['timers'], 1)
+        self.assertTrue([s for s in snap['slow'] if '__slow_cb' in s[0]])
+        self.assertFalse(os.path.exists(path))
+        with open(path, 'w') as f: # somebody else's file -- not ours to unlink
+            f.write('precious')
+        try:
+            self.assertRaises(OSError, status.serve, path)
+            with open(path) as f:
+                self.assertEqual(f.read(), 'precious')
+        finally:
+            status.stop()
+            os.unlink(path)
+        runtime = os.environ.pop('XDG_RUNTIME_DIR', None)
+        try:
+            private = os.path.dirname(status.default_path())
+            self.assertEqual(os.stat(private).st_mode & 0o777, 0o700)
+            os.environ['XDG_RUNTIME_DIR'] = '/run/user/elsewhere'
+            self.assertEqual(status.default_path(7), '/run/user/elsewhere/rel-7.sock')
+        finally:
+            os.environ.pop('XDG_RUNTIME_DIR', None)
+            runtime is None or os.environ.setdefault('XDG_RUNTIME_DIR', runtime)
+
+    def test_accept(self):
+        conns = []
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(16)
+        clients = [socket.create_connection(server.getsockname()) for i in range(5)]
+        acceptor = listen_accept(server, lambda conn, addr : conns.append(conn))
+        dispatched = rel.registrar.dispatched
+        self.harness.run(until=lambda : len(conns) == 5)
+        self.assertEqual(rel.registrar.dispatched - dispatched, 1)
+        self.assertEqual(acceptor.accepted, 5)
+        acceptor.close()
+        for sock in conns + clients + [server]:
+            sock.close()
+
+    def test_connect(self):
+        got = []
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(16)
+        addr = server.getsockname()
+        connect(addr, lambda sock : got.append(sock), got.append)
+        self.harness.run(until=lambda : got)
+        self.assertEqual(got[0].getpeername(), addr)
+        got[0].close()
+        server.close()
+        connect(addr, got.append, lambda e : got.append(e.errno)) # nobody there now
+        self.harness.run(until=lambda : len(got) == 2)
+        self.assertEqual(got[1], errno.ECONNREFUSED)
+        path = tempfile.mktemp()
+        server = socket.socket(socket.AF_UNIX)
+        server.bind(path)
+        server.listen(0)
+        for i in range(3): # the backlog fills up -- EAGAIN is a failure here, not "in progress"
+            connect(path, got.append, lambda e : got.append(e.errno))
+        self.harness.run(until=lambda : len(got) == 5)
+        self.assertEqual(got[-1], errno.EAGAIN)
+        for sock in got:
+            hasattr(sock, 'close') and sock.close()
+        server.close()
+        os.unlink(path)
+
+    def test_pool(self):
+        conns = []
+        got = []
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(16)
+        addr = server.getsockname()
+        acceptor = listen_accept(server, lambda conn, a : conns.append(conn))
+        pool = Pool(max_per_host=1)
+        pool.acquire(addr, got.append)
+        pool.acquire(addr, got.append) # waits for the first one
+        self.harness.run(until=lambda : got and conns)
+        self.assertEqual(pool.report()['waiting'], 1)
+        pool.release(addr, got[0])
+        self.assertEqual(got[1], got[0])
+        pool.release(addr, got[1])
+        pool.acquire(addr, got.append)
+        self.assertEqual(got[2], got[0])
+        self.assertEqual(pool.report()['connects'], 1)
+        rel.safe_read() # drops read() args -- which the idle watcher mustn't need
+        try:
+            pool.release(addr, got[2])
+            conns[0].close() # idle, and the upstream hangs up
+            self.harness.run(until=lambda : pool.evictions)
+        finally:
+            rel.SAFE_READ = False
+        self.assertEqual(pool.report()['open'], 0)
+        pool.acquire(addr, got.append)
+        self.harness.run(until=lambda : len(got) == 4)
+        self.assertNotEqual(got[3], got[0])
+        pool.release(addr, got[3])
+        self.harness.run(until=lambda : pool.evictions == 2) # POOL_IDLE
+        self.assertEqual(pool.report(), {'open': 0, 'idle': 0, 'waiting': 0, 'reused': 2, 'connects': 2, 'evictions': 2})
+        errors = []
+        pool.acquire(addr, got.append, errors.append) # connecting
+        pool.acquire(addr, got.append, errors.append) # waiting
+        pool.close()
+        self.assertEqual([e.errno for e in errors], [errno.ECONNABORTED] * 2)
+        self.assertEqual(pool.report()['open'], 0)
+        self.harness.run(1)
+        self.assertEqual(len(got), 4) # the cancelled connect never came through
+        acceptor.close()
+        for sock in conns + [server]:
+            sock.close()
+
+    def test_datagram(self):
+        got = []
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.bind(('127.0.0.1', 0))
+        dgram = Datagram(server, lambda data, addr : got.append((bytes(data), addr)), batch=4)
+        for i in range(10):
+            client.sendto(b'packet %d'%(i,), server.getsockname())
+        self.assertEqual(dgram.pool, [])
+        self.harness.run(until=lambda : len(got) == 10)
+        self.assertEqual([data for (data, addr) in got], [b'packet %d'%(i,) for i in range(10)])
+        self.assertTrue(1 <= len(dgram.pool) <= 4)
+        self.assertEqual(got[0][1], client.getsockname())
+        replier = Datagram(client, dest_max=2)
+        results = [replier.sendto(b'reply', server.getsockname()) for i in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])
+        self.harness.run(until=lambda : len(got) == 12)
+        self.assertEqual(replier.report()['sent'], 2)
+        self.assertEqual(replier.report()['drops'], 3)
+        dgram.close()
+        replier.close()
+        server.close()
+        client.close()
+
+    def test_tls(self):
+        if not shutil.which('openssl'):
+            return self.skipTest('openssl missing')
+        tmp = tempfile.mkdtemp()
+        cert, key = os.path.join(tmp, 'cert.pem'), os.path.join(tmp, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+            '-subj', '/CN=localhost', '-keyout', key, '-out', cert], check=True, capture_output=True)
+        server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_ctx.load_cert_chain(cert, key)
+        client_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        client_ctx.load_verify_locations(cert)
+        shutil.rmtree(tmp)
+        secure, got, echoed = {}, [], []
+        payload = os.urandom(300000)
+        def __server_ready(sock):
+            secure['server'] = sock
+            event.read(sock, lambda data : got.append(data) or True, drain=4096)
+        def __client_ready(sock):
+            secure['client'] = sock
+            event.read(sock, lambda data : echoed.append(data) or True, drain=65536)
+            buffwrite(sock, payload, None, None)
+        pair = self.harness.pair()
+        tls.wrap(pair.local, server_ctx, __server_ready, server_side=True)
+        tls.wrap(pair.remote, client_ctx, __client_ready, server_hostname='localhost')
+        self.harness.run(5, until=lambda : sum(map(len, filter(None, got))) >= len(payload))
+        self.assertEqual(len(secure), 2)
+        self.assertEqual(b''.join(filter(None, got)), payload)
+        buffwrite(secure['server'], b'pong', None, None)
+        self.harness.run(5, until=lambda : any(echoed))
+        self.assertEqual(b''.join(filter(None, echoed)), b'pong') # None: TLS records sans data
+        for sock in secure.values():
+            release_buff(sock)
+
+    def test_process(self):
+        out, err, exits = [], [], []
+        script = 'import sys; sys.stdout.write(sys.stdin.read().upper()); sys.stderr.write("oops"); sys.exit(3)'
+        child = spawn_process([sys.executable, '-c', script], out.append, err.append, exits.append)
+        child.write(b'hello ' * 20000)
+        child.close_stdin()
+        self.harness.run(until=lambda : exits)
+        self.assertEqual(exits, [3])
+        self.assertEqual(b''.join(out), b'HELLO ' * 20000)
+        self.assertEqual(err, [b'oops'])
+        rel.safe_read() # drops read() args -- which spawn_process() mustn't need
+        try:
+            spawn_process([sys.executable, '-c', 'print("safe")'], out.append, on_exit=exits.append)
+            self.harness.run(until=lambda : len(exits) == 2)
+        finally:
+            rel.SAFE_READ = False
+        self.assertEqual(out[-1].strip(), b'safe')
+        exits.pop()
+        self.assertEqual(rel.report()['reads'], 0)
+        self.assertEqual(rel.report()['signals'], 0) # nothing left to keep the loop going
+        sleeper = spawn_process([sys.executable, '-c', 'import time; time.sleep(30)'], on_exit=exits.append)
+        sleeper.kill()
+        self.harness.run(until=lambda : len(exits) == 2)
+        self.assertEqual(exits[1], -signal.SIGTERM)
+        mine = []
+        event.signal(signal.SIGCHLD, mine.append, 'chld') # the application's own, registered in between
+        spawn_process([sys.executable, '-c', 'pass'], on_exit=exits.append)
+        self.harness.run(until=lambda : len(exits) == 3)
+        self.assertEqual(exits[2], 0)
+        self.assertTrue(mine, 'application SIGCHLD callback dropped')
+        self.assertEqual(rel.registrar.signals[signal.SIGCHLD].cb, mine.append) # handed back
+        script = 'import sys, rel; rel.spawn_process([sys.executable, "-c", "pass"], on_exit=print); rel.dispatch(); print("done")'
+        output = subprocess.check_output([sys.executable, '-c', script], timeout=10)
+        self.assertEqual(output.decode().split(), ['0', 'done'])
+
+    def test_probe(self):
+        path = os.path.join(tempfile.gettempdir(), 'rel-test-probe-%s.json'%(os.getpid(),))
+        try:
+            self.assertNotEqual(probe.probe('select', 16, 5), None)
+            self.assertEqual(probe.probe('pyevent'), None)
+            methods = probe.choose(['select', 'poll', 'pyevent'], 16, path)
+            self.assertEqual(sorted(methods), ['poll', 'pyevent', 'select'])
+            self.assertEqual(methods[-1], 'pyevent')
+            with open(path) as f:
+                cache = json.load(f)
+            key = probe.cache_key(['select', 'poll', 'pyevent'], 16)
+            self.assertEqual(cache[key], methods[0])
+            loser = methods[1]
+            cache[key] = loser
+            with open(path, 'w') as f:
+                json.dump(cache, f)
+            self.assertEqual(probe.choose(['select', 'poll', 'pyevent'], 10, path)[0], loser)
+            self.assertEqual(probe.cache_key(['select'], 1000), probe.cache_key(['select'], 300))
+            self.assertFalse([f for f in os.listdir(os.path.dirname(path)) if f.startswith('.rel-probe-')])
+            xdg = os.environ.get('XDG_CACHE_HOME')
+            os.environ['XDG_CACHE_HOME'] = '/nonexistent/cache'
+            try:
+                self.assertEqual(probe.default_path(), '/nonexistent/cache/rel-probe.json')
+            finally:
+                if xdg is None:
+                    del os.environ['XDG_CACHE_HOME']
+                else:
+                    os.environ['XDG_CACHE_HOME'] = xdg
+        finally:
+            os.path.exists(path) and os.unlink(path)
+
+class UtilTest(unittest.TestCase):
+
+    def setUp(self):
+        self.harness = Harness()
+        self.harness.start()
+
+    def tearDown(self):
+        self.harness.stop()
+
+    def test_unlisten(self):
+        got = []
+        sub = util.listen('test.unlisten', got.append)
+        util.emit('test.unlisten', 1)
+        sub.cancel()
+        util.emit('test.unlisten', 2)
+        self.assertEqual(got, [1])
+        self.assertFalse('test.unlisten' in util.listeners)
+
+    def test_patterns(self):
+        got = []
+        util.listen('conn.*.closed', lambda n : got.append(('closed', n)))
+        sub = util.listen('conn.**', lambda n : got.append(('any', n)))
+        util.emit('conn.7.closed', 7)
+        util.emit('conn.7.opened', 8)
+        util.unlisten(sub)
+        util.emit('conn.9.closed', 9)
+        self.assertEqual(got, [('closed', 7), ('any', 7), ('any', 8), ('closed', 9)])
+
+    def test_post(self):
+        got = []
+        batches = []
+        util.listen('test.post', got.append)
+        util.listen('test.post', batches.append, True)
+        util.post('test.post', 1)
+        util.post('test.post', 2)
+        self.assertEqual(got, [])
+        self.harness.run(until=lambda : got)
+        self.assertEqual(got, [1, 2])
+        self.assertEqual(batches, [[((1,), {}), ((2,), {})]])
+        util.post('test.post', 3)
+        rel.init() # the queued flush goes with the old registrar state
+        util.post('test.post', 4)
+        self.harness.run(until=lambda : len(got) == 4)
+        self.assertEqual(got, [1, 2, 3, 4])
+
+    def test_cache(self):
+        calls = []
+        def __route_cb(name):
+            calls.append(name)
+            return name.upper()
+        util.listen('test.route', __route_cb)
+        memo = util.cache('test.route', ttl=60, size=2)
+        for name in ('a', 'a', 'b', 'a'):
+            self.assertEqual(util.ask('test.route', name), name.upper())
+        self.assertEqual(calls, ['a', 'b'])
+        util.emit('test.route.invalidate', 'a')
+        util.ask('test.route', 'a')
+        util.ask('test.route', 'c') # evicts 'b'
+        util.ask('test.route', 'b')
+        self.harness.run(120) # expires everything
+        util.ask('test.route', 'a')
+        self.assertEqual(calls, ['a', 'b', 'a', 'c', 'b', 'a'])
+        self.assertEqual(memo.report(), {'hits': 2, 'misses': 6, 'entries': 2})
+        util.uncache('test.route')
+
+    def test_happenings(self):
+        got = []
+        util.when('test.ready', got.append, 1)
+        util.transpire('test.ready', ttl=30, defer=True)
+        util.when('test.ready', got.append, 2)
+        self.assertEqual(got, [2])
+        self.harness.run(60)
+        self.assertEqual(got, [2, 1])
+        self.assertFalse('test.ready' in util.happenings)
+        ns = util.namespace('test.request')
+        ns.when('done', got.append, 3)
+        self.assertEqual(len(ns.events), 1)
+        util.forgetNamespace('test.request')
+        ns.transpire('done')
+        self.assertEqual(got, [2, 1])
+
+    def test_no_ssl(self):
+        script = """if True:
+            import sys, socket
+            sys.modules['ssl'] = None # as if python were built without it
+            import rel
+            from rel.harness import Harness, SocketPair
+            errors = []
+            with Harness() as harness:
+                pair = SocketPair()
+                pair.hangup()
+                rel.read(pair.local, lambda data : True, drain=65536)
+                rel.buffwrite(pair.local, b'x', None, errors.append)
+                harness.run(until=lambda : errors)
+            print(len(errors), 'ssl' in sys.modules and sys.modules['ssl'])
+        """
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', script]).decode().split(), ['1', 'None'])
+
+    def test_import(self):
+        cmd = [sys.executable, '-c', 'import sys, rel; print(" ".join([m for m in %r if m in sys.modules]))'%(IMPORT_LAZY,)]
+        self.assertEqual(subprocess.check_output(cmd).decode().strip(), '')
+        cmd = [sys.executable, '-c', 'import rel; rel.buffwrite, rel.listen_accept, rel.spawn_process, rel.spawn_task, rel.connect']
+        self.assertEqual(subprocess.call(cmd), 0)
+
+    def test_import_time(self):
+        if os.environ.get('REL_NO_BENCH'):
+            return self.skipTest('REL_NO_BENCH is set')
+        costs = []
+        for i in range(3): # best of 3 -- a busy machine only ever makes it slower
+            lines = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import rel'],
+                stderr=subprocess.PIPE).stderr.decode().splitlines()
+            costs.append(int([l for l in lines if l.endswith('| rel')][0].split('|')[1]))
+        self.assertLess(min(costs), IMPORT_BUDGET, '"import rel" took %sus (budget: %sus)'%(min(costs), IMPORT_BUDGET))
+
 if __name__ == '__main__':
     if input("run these tests with select registrar? (y/N)").lower().startswith("y"):
         rel.initialize(['select'], ['verbose', 'strict'])
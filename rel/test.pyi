@@ -1,16 +1,37 @@
 import unittest
 from . import rel as rel
+from .harness import Harness as Harness, SocketPair as SocketPair
+from .registrar import SLEEP_TURBO as SLEEP_TURBO, TOMBSTONE_MAX as TOMBSTONE_MAX
+from . import util as util
+from . import status as status
+from . import probe as probe
+from .buff import buffwrite as buffwrite, release_buff as release_buff, throttle_buff as throttle_buff
+from . import tls as tls
+from .process import spawn_process as spawn_process
+from .task import spawn_task as spawn_task
+from . import trace as trace
+from . import sampler as sampler
+from . import buff as buff
+from . import shed as shed
+from .net import Datagram as Datagram, Pool as Pool, connect as connect, listen_accept as listen_accept
 from _typeshed import Incomplete
 
 unittest2: Incomplete
 possible_build_dir: Incomplete
+BUFF_SOAK: int
+IMPORT_BUDGET: int
+IMPORT_LAZY: Incomplete
 
 class EventTest(unittest.TestCase):
     def skip(self, reason) -> None: ...
     call_back_ran: bool
     def setUp(self) -> None: ...
+    def tearDown(self) -> None: ...
     def test_timeout(self) -> None: ...
     def test_timeout2(self) -> None: ...
+    def test_slack(self) -> None: ...
+    def test_lazy_cancel(self) -> None: ...
+    def test_rearm_compact(self) -> None: ...
     def test_signal(self) -> None: ...
     def test_signal2(self) -> None: ...
     def test_read(self) -> None: ...
@@ -21,3 +42,44 @@ class EventTest(unittest.TestCase):
     call_back_ran_a: bool
     call_back_ran_b: bool
     def test_thread(self) -> None: ...
+
+class HarnessTest(unittest.TestCase):
+    harness: Incomplete
+    def setUp(self) -> None: ...
+    def tearDown(self) -> None: ...
+    def test_virtual_clock(self) -> None: ...
+    def test_want_shared(self) -> None: ...
+    def test_socketpair(self) -> None: ...
+    def test_priority(self) -> None: ...
+    def test_drain(self) -> None: ...
+    def test_throttle(self) -> None: ...
+    def test_drain_shutdown(self) -> None: ...
+    def test_buff_cleanup(self) -> None: ...
+    def test_buff_soak(self) -> None: ...
+    def test_shed(self) -> None: ...
+    def test_task(self) -> None: ...
+    def test_call_soon(self) -> None: ...
+    def test_trace(self) -> None: ...
+    def test_sampler(self) -> None: ...
+    def test_wheel(self) -> None: ...
+    def test_status(self) -> None: ...
+    def test_accept(self) -> None: ...
+    def test_connect(self) -> None: ...
+    def test_pool(self) -> None: ...
+    def test_datagram(self) -> None: ...
+    def test_tls(self) -> None: ...
+    def test_process(self) -> None: ...
+    def test_probe(self) -> None: ...
+
+class UtilTest(unittest.TestCase):
+    harness: Incomplete
+    def setUp(self) -> None: ...
+    def tearDown(self) -> None: ...
+    def test_unlisten(self) -> None: ...
+    def test_patterns(self) -> None: ...
+    def test_post(self) -> None: ...
+    def test_cache(self) -> None: ...
+    def test_happenings(self) -> None: ...
+    def test_no_ssl(self) -> None: ...
+    def test_import(self) -> None: ...
+    def test_import_time(self) -> None: ...
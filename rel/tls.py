@@ -0,0 +1,68 @@
+"""
+This module contains non-blocking TLS helpers: Handshake and wrap().
+
+### Handshake
+This class drives do_handshake() on a non-blocking ssl.SSLSocket
+(wrapped with do_handshake_on_connect=False). Each SSLWantReadError
+or SSLWantWriteError waits for that readiness, and once the handshake
+completes, cb(sock, *args) is called. On failure, the socket is closed
+and onerror(sock, error) is called (if given).
+
+### wrap(sock, context, cb, *args, server_side=False, server_hostname=None, onerror=None)
+This function wraps a connected (or accepted) socket with the given
+ssl.SSLContext and starts a Handshake. The resulting SSLSocket can
+then be handed to read() (drain mode or not) and buffwrite():
+
+    def on_secure(sock):
+        rel.read(sock, on_data, drain=DRAIN_BUDGET)
+        rel.buffwrite(sock, b"hello", None, None)
+
+    wrap(conn, context, on_secure, server_side=True)
+"""
+
+import ssl
+from .rel import read, write
+from .util import Basic
+
+class Handshake(Basic):
+    def __init__(self, sock, cb, *args, onerror=None):
+        self.sock = sock
+        self.cb = cb
+        self.args = args
+        self.onerror = onerror
+        self.listener = None
+        self.subname = sock.fileno()
+        self.sock.setblocking(False)
+        self.attempt()
+
+    def attempt(self):
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            return self.wait("read")
+        except ssl.SSLWantWriteError:
+            return self.wait("write")
+        except OSError as e:
+            self.log("handshake failed:", e)
+            self.close()
+            self.sock.close()
+            return self.onerror and self.onerror(self.sock, e)
+        self.log("handshake complete")
+        self.close()
+        self.cb(self.sock, *self.args)
+
+    def wait(self, evtype):
+        if self.listener is None or self.listener.evtype != evtype:
+            self.close()
+            self.listener = (read if evtype == "read" else write)(self.sock, self.attempt)
+        return True
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.delete()
+            self.listener = None
+
+def wrap(sock, context, cb, *args, server_side=False, server_hostname=None, onerror=None):
+    sock = context.wrap_socket(sock, server_side=server_side,
+        server_hostname=server_hostname, do_handshake_on_connect=False)
+    return Handshake(sock, cb, *args, onerror=onerror)
@@ -0,0 +1,17 @@
+from .rel import read as read, write as write
+from .util import Basic as Basic
+from _typeshed import Incomplete
+
+class Handshake(Basic):
+    sock: Incomplete
+    cb: Incomplete
+    args: Incomplete
+    onerror: Incomplete
+    listener: Incomplete
+    subname: Incomplete
+    def __init__(self, sock, cb, *args, onerror: Incomplete | None = ...) -> None: ...
+    def attempt(self): ...
+    def wait(self, evtype): ...
+    def close(self) -> None: ...
+
+def wrap(sock, context, cb, *args, server_side: bool = ..., server_hostname: Incomplete | None = ..., onerror: Incomplete | None = ...): ...
@@ -1,6 +1,6 @@
 """
-This module contains a single tool (Timer) and a
-CLI wrapper (timerCLI()).
+This module contains two tools (Timer and Top) and
+their CLI wrappers (timerCLI() and topCLI()).
 
 ### Timer
 Timer's start() function contains basic usage examples
@@ -46,6 +46,19 @@ When the time runs out, a sound will play on two conditions:
 there is a readable file at the specified path (configurable
 via the -p flag, with default: ~/.rtimer/),
 and mplayer is installed.
+
+### Top
+Top polls the status endpoint of a rel process (see the status
+module) on an interval, and displays counts, loop lag, unsent
+buffwrite() bytes, and the slowest callbacks.
+
+### usage
+
+    rtop [pid]
+
+The process must have been initialized with the "status" option.
+The -s flag specifies a UNIX socket path instead of a pid, -p a
+localhost port, and -i the polling interval (default: 1 second).
 """
 
 import rel, os, random
@@ -131,6 +144,47 @@ class Timer(object):
             getoutput("mplayer %s"%(os.path.join(self.media, random.choice(os.listdir(self.media))),))
         self.stop()
 
+# rtop
+
+RTOP_USAGE = 'rtop [pid]\n--\npolls the status endpoint of a rel process initialized with the "status" option. use -s to specify a UNIX socket path instead of a pid, -p to specify a localhost port, and -i to set the polling interval in seconds (default: 1).'
+
+class Top(object):
+    def __init__(self, path=None, port=None, interval=1):
+        self.path = path
+        self.port = port
+        self.interval = interval
+
+    def start(self):
+        notice("polling %s every %s seconds"%(self.path or self.port, self.interval))
+        self.update()
+        rel.timeout(self.interval, self.update)
+        rel.signal(2, exit)
+        rel.dispatch()
+
+    def update(self):
+        from rel.status import fetch
+        try:
+            status = fetch(self.path, self.port)
+        except Exception as e:
+            error("could not reach %s"%(self.path or self.port,), str(e))
+            return False
+        self.display(status)
+        return True
+
+    def display(self, status):
+        counts = status.get("counts", {})
+        buffers = status.get("buffers", {})
+        lines = [
+            "pid: %s. registrar: %s."%(status["pid"], status["registrar"]),
+            "  ".join(["%s: %s"%(k, counts[k]) for k in sorted(counts) if "lag" not in k]),
+            "lag: %.2fms. max lag: %.2fms."%(counts.get("lag", 0) * 1000, counts.get("maxlag", 0) * 1000),
+            "buffwrites: %s sockets, %s bytes unsent."%(len(buffers), sum(buffers.values())),
+            "slowest callbacks (calls / total ms / max ms):"
+        ]
+        for name, calls, total, longest in status.get("slow", []):
+            lines.append("  %8s %10.2f %8.2f  %s"%(calls, total * 1000, longest * 1000, name))
+        notice(*lines)
+
 ### functions for interpreting command-line instructions
 
 # rtimer
@@ -160,3 +214,21 @@ def timerCLI():
         arguments[3] = arguments[3] or int(options.increment)
     arguments.append(options.path)
     Timer(*arguments).start()
+
+# rtop
+
+def topCLI():
+    from optparse import OptionParser
+    from rel.status import default_path
+    parser = OptionParser(RTOP_USAGE)
+    parser.add_option("-s", "--socket", dest="socket", default=None, help="status socket path. default: derived from pid")
+    parser.add_option("-p", "--port", dest="port", default=None, help="status port (localhost). default: None")
+    parser.add_option("-i", "--interval", dest="interval", default=1, help="polling interval in seconds. default: 1")
+    options, arguments = parser.parse_args()
+    port = options.port and int(options.port)
+    path = options.socket
+    if not (path or port):
+        if not arguments:
+            error("no pid, socket, or port specified", "USAGE: %s"%(RTOP_USAGE,))
+        path = default_path(arguments[0])
+    Top(path, port, float(options.interval)).start()
@@ -17,4 +17,16 @@ class Timer:
     def update(self): ...
     def alarm(self) -> None: ...
 
+RTOP_USAGE: str
+
+class Top:
+    path: Incomplete
+    port: Incomplete
+    interval: Incomplete
+    def __init__(self, path: Incomplete | None = ..., port: Incomplete | None = ..., interval: int = ...) -> None: ...
+    def start(self) -> None: ...
+    def update(self): ...
+    def display(self, status) -> None: ...
+
 def timerCLI() -> None: ...
+def topCLI() -> None: ...
@@ -0,0 +1,119 @@
+"""
+This module contains a low-overhead loop tracer: Tracer, start(),
+stop(), and dump().
+
+### start(size=TRACE_SIZE)
+This function attaches a Tracer to the registrar. Each loop() then
+records its sleep and its poll (with the number of dispatches), every
+callback's start and end (fd and evtype for SocketIOs, lateness for
+Timers), and every buffwrite() flush size, into a ring buffer of the
+last size entries. Callbacks are recorded by name (worked out as they
+run, so the buffer never keeps a closed socket or its callback alive),
+and the JSON is only built at dump() time, so it can be left on in
+production. Usually enabled via:
+
+    rel.initialize(options=["trace"])
+
+which also dumps the buffer on SIGUSR2 (where available).
+
+### dump(path=None)
+This function writes the buffer out as Chrome trace-event JSON (default:
+rel-trace-[pid].json in the temp directory), which can be opened in
+Perfetto (ui.perfetto.dev) or chrome://tracing, and returns the path.
+"""
+
+import os, time, json, signal, tempfile
+from collections import deque
+from . import rel
+from .listener import SocketIO, Timer
+
+TRACE_SIZE = 65536
+TRACE_SIGNAL = getattr(signal, "SIGUSR2", None)
+
+def default_path(pid=None):
+    return os.path.join(tempfile.gettempdir(), "rel-trace-%s.json"%(pid or os.getpid(),))
+
+def describe(target): # -> name, (fd, evtype, cb) or None
+    if isinstance(target, SocketIO):
+        return "%s %s"%(target.evtype, target.fd), (target.fd, target.evtype, getattr(target.cb, "__qualname__", None))
+    if isinstance(target, Timer):
+        return getattr(target.cb, "__qualname__", "timer"), None
+    name = getattr(target, "__qualname__", None)
+    if name is None:
+        try:
+            name = repr(target)
+        except Exception:
+            name = target.__class__.__name__
+    return name, None
+
+class Tracer(object):
+    def __init__(self, size=TRACE_SIZE):
+        self.events = deque(maxlen=size)
+        self.origin = time.perf_counter()
+
+    def __repr__(self):
+        return '<Tracer Object | Events:"%s">'%(len(self.events),)
+
+    def add(self, kind, target, start, end, note=None):
+        if target is not None:
+            target = describe(target)
+        self.events.append((kind, target, start, end, note))
+
+    def flush(self, fd, nbytes):
+        self.events.append(("flush", fd, time.perf_counter(), None, nbytes))
+
+    def clear(self):
+        self.events.clear()
+
+    def export(self):
+        pid = os.getpid()
+        trace = []
+        for kind, target, start, end, note in list(self.events):
+            event = {"cat": kind, "ts": (start - self.origin) * 1e6, "pid": pid, "tid": 0}
+            if kind == "flush":
+                event.update(name="buffwrite", ph="C", args={"fd %s"%(target,): note})
+            else:
+                event.update(ph="X", dur=(end - start) * 1e6)
+                if kind == "callback":
+                    event["name"], fields = target
+                    event["args"] = fields and dict(zip(("fd", "evtype", "cb"), fields)) or {}
+                    if note is not None:
+                        event["args"]["late"] = note
+                else:
+                    event["name"] = kind
+                    if note is not None:
+                        event["args"] = {"dispatched": note}
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.export(), f, separators=(",", ":"))
+        return path
+
+def start(size=TRACE_SIZE):
+    rel.check_init()
+    if rel.registrar == rel.pyevent:
+        return rel.log("Tracing disabled in pyevent. Choose epoll, kqueue, poll, or select to enable tracing.")
+    if rel.registrar.tracer is None:
+        rel.registrar.tracer = Tracer(size)
+    return rel.registrar.tracer
+
+def stop():
+    rel.check_init()
+    tracer = getattr(rel.registrar, "tracer", None)
+    if tracer is not None:
+        rel.registrar.tracer = None
+    return tracer
+
+def dump(path=None):
+    tracer = getattr(rel.registrar, "tracer", None)
+    if tracer is None:
+        return rel.log("dump: not tracing")
+    path = tracer.dump(path or default_path())
+    rel.log("trace: wrote %s events to %s"%(len(tracer.events), path))
+    return path
+
+def on_signal(sig=TRACE_SIGNAL):
+    if sig is not None: # dump from the loop, not from inside the handler
+        rel.signal(sig, rel.call_soon, dump)
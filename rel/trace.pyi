@@ -0,0 +1,24 @@
+from . import rel as rel
+from .listener import SocketIO as SocketIO, Timer as Timer
+from _typeshed import Incomplete
+
+TRACE_SIZE: int
+TRACE_SIGNAL: Incomplete
+
+def default_path(pid: Incomplete | None = ...): ...
+def describe(target): ...
+
+class Tracer:
+    events: Incomplete
+    origin: Incomplete
+    def __init__(self, size=...) -> None: ...
+    def add(self, kind, target, start, end, note: Incomplete | None = ...) -> None: ...
+    def flush(self, fd, nbytes) -> None: ...
+    def clear(self) -> None: ...
+    def export(self): ...
+    def dump(self, path): ...
+
+def start(size=...): ...
+def stop(): ...
+def dump(path: Incomplete | None = ...): ...
+def on_signal(sig=...) -> None: ...
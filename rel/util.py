@@ -1,28 +1,79 @@
 """
-This module contains five functions: emit(), ask(), listen(),
-when(), and transpire().
+This module contains ten functions: emit(), post(), ask(), cache(),
+listen(), unlisten(), when(), transpire(), forget(), and namespace().
 
-### listen(channel, cb)
-This function registers a listener callback on a channel.
+### listen(channel, cb, batch=False)
+This function registers a listener callback on a channel, and returns
+a Subscription, which may be cancel()ed (or passed to unlisten()) in
+O(1). A channel containing "*" is a pattern, matched segment-wise
+against "."-separated channel names: "*" matches a single segment,
+"**" matches one or more segments, and "*" within a segment is a glob.
+So "conn.*.closed" matches "conn.12.closed", and "conn.**" matches
+everything under "conn". Patterns are compiled once, and pattern
+matches are cached per channel.
+
+### unlisten(subscription)
+This function removes a listen()er.
 
 ### emit(channel, *args, **kwargs)
 This function emits an event to all listen()ers on a channel.
 
+### post(channel, *args, **kwargs)
+This function is a deferred emit(): the event is queued and delivered
+on the next pass of the rel loop, so the caller never runs listener
+code. All the posts to a channel within a tick are delivered together
+-- a batch listener (listen(channel, cb, True)) gets them in a single
+call, as a list of (args, kwargs) pairs.
+
 ### ask(channel, *args, **kwargs)
 This function requests an answer from the first registered
 listen()er on a channel.
 
+### cache(channel, ttl=None, size=1024)
+This function turns on memoization of ask() answers for a channel,
+keyed by the (hashable) arguments, for up to ttl seconds (forever if
+ttl is None) with at most size entries (least recently used go first).
+Emitting on the companion channel ("%s.invalidate"%(channel,)) drops
+the entry for the given arguments, or everything if none are given.
+The returned Cache keeps hit and miss counts (see its report()), and
+uncache(channel) turns memoization back off.
+
 ### when(event, cb, *args, **kwargs)
 This function calls cb if an event has transpire()d or
 registers it to be called the first time it transpire()s.
 
-### transpire(event)
+### transpire(event, ttl=None, defer=False)
 This function triggers any when()-registered event
 listeners, and notes that the event has transpired.
+With ttl, the event is forgotten ttl seconds later.
+With defer, the waiting callbacks run as a batch on
+the next pass of the rel loop instead of inline.
+
+### forget(event)
+This function drops an event (transpired or not) and
+any callbacks waiting on it.
+
+### namespace(name, ttl=None)
+This function returns a Happenings store with its own
+when(), transpire() and forget() (the module-level
+functions use a default store). Per-request events
+can live in a namespace that is discarded in one go
+with forgetNamespace(name). Events transpired in a
+namespace with a ttl are forgotten after ttl seconds.
 """
 
+from collections import OrderedDict
+
 listeners = {}
+patterns = {}
+matches = {}
+posts = {}
+scheduled = None # the call_soon() queue a flush() is waiting in
+caches = {}
+clock = None # registrar.clock(), resolved on first use (registrar imports this module)
 happenings = {}
+namespaces = {}
+MATCH_CACHE = 10000
 verbose = False
 LOUD = True
 
@@ -49,35 +100,274 @@ class Basic(object):
 				self.name = "%s(%s)"%(self.name, self.subname)
 		log("%s : %s"%(self.name, " ".join([str(m) for m in msg])))
 
+class Subscription(object):
+	def __init__(self, channel, cb, batch=False):
+		self.channel = channel
+		self.cb = cb
+		self.batch = batch
+
+	def __repr__(self):
+		return '<Subscription Object | Channel:"%s">'%(self.channel,)
+
+	def deliver(self, items):
+		if self.batch:
+			self.cb(items)
+		else:
+			for args, kwargs in items:
+				self.cb(*args, **kwargs)
+
+	def cancel(self):
+		unlisten(self)
+
+def isPattern(channel):
+	return isinstance(channel, str) and "*" in channel
+
+def compilePattern(pattern):
+	import re
+	parts = []
+	for part in pattern.split("."):
+		if part == "**":
+			parts.append(".+")
+		else:
+			parts.append(re.escape(part).replace("\\*", "[^.]*"))
+	return re.compile("\\.".join(parts) + "$")
+
+def subscribers(channel):
+	subs = list(listeners.get(channel, ()))
+	if patterns and isinstance(channel, str):
+		if channel not in matches:
+			if len(matches) > MATCH_CACHE:
+				matches.clear()
+			matches[channel] = [p for p in patterns if patterns[p][0].match(channel)]
+		for p in matches[channel]:
+			subs.extend(patterns[p][1])
+	return subs
+
 def emit(channel, *args, **kwargs): # all cbs called, no return value
-	if channel not in listeners:
+	subs = subscribers(channel)
+	if not subs:
 		return notListening("emit", channel)
-	for cb in listeners[channel]:
-		cb(*args, **kwargs)
+	for sub in subs:
+		if sub.batch:
+			sub.cb([(args, kwargs)])
+		else:
+			sub.cb(*args, **kwargs)
+
+def post(channel, *args, **kwargs): # emit() on the next tick
+	global scheduled
+	from . import rel
+	rel.check_init()
+	queue = getattr(rel.registrar, "soon", rel.registrar) # pyevent has no queue of its own
+	if scheduled is not queue: # none yet, or lost to a re-initialized registrar
+		scheduled = queue
+		rel.call_soon(flush)
+	if channel not in posts:
+		posts[channel] = []
+	posts[channel].append((args, kwargs))
+
+def flush():
+	global posts, scheduled
+	scheduled = None
+	batches = posts
+	posts = {}
+	for channel, items in batches.items():
+		subs = subscribers(channel)
+		if not subs:
+			notListening("post", channel)
+		for sub in subs:
+			sub.deliver(items)
 
 def ask(channel, *args, **kwargs): # only 1st cb called, data returned
-	if channel not in listeners:
+	memo = caches.get(channel)
+	if memo is not None:
+		key = memo.key(args, kwargs)
+		if key is not None:
+			found, answer = memo.get(key)
+			if found:
+				return answer
+	subs = subscribers(channel)
+	if not subs:
 		return notListening("ask", channel)
-	for cb in listeners[channel]:
-		return cb(*args, **kwargs)
+	answer = subs[0].cb(*args, **kwargs)
+	if memo is not None and key is not None:
+		memo.put(key, answer)
+	return answer
 
-def listen(channel, cb):
-	if channel not in listeners:
-		listeners[channel] = []
-	listeners[channel].append(cb)
+class Cache(object):
+	def __init__(self, channel, ttl=None, size=1024):
+		self.channel = channel
+		self.ttl = ttl
+		self.size = size
+		self.entries = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.sub = listen("%s.invalidate"%(channel,), self.invalidate)
 
-def when(event, cb, *args, **kwargs):
-	if event not in happenings:
-		happenings[event] = []
-	if happenings[event] == "transpired":
-		cb(*args, **kwargs)
+	def __repr__(self):
+		return '<Cache Object | Channel:"%s">'%(self.channel,)
+
+	def key(self, args, kwargs):
+		key = kwargs and (args, tuple(sorted(kwargs.items()))) or args
+		try:
+			hash(key)
+		except TypeError:
+			return None
+		return key
+
+	def now(self):
+		global clock
+		if clock is None:
+			from .registrar import clock
+		return clock()
+
+	def get(self, key):
+		entry = self.entries.get(key)
+		if entry is not None:
+			if entry[1] is None or entry[1] > self.now():
+				self.hits += 1
+				self.entries.move_to_end(key)
+				return True, entry[0]
+			del self.entries[key]
+		self.misses += 1
+		return False, None
+
+	def put(self, key, answer):
+		expiration = None
+		if self.ttl is not None:
+			expiration = self.now() + self.ttl
+		self.entries[key] = (answer, expiration)
+		self.entries.move_to_end(key)
+		while len(self.entries) > self.size:
+			self.entries.popitem(last=False)
+
+	def invalidate(self, *args, **kwargs):
+		if args or kwargs:
+			self.entries.pop(self.key(args, kwargs), None)
+		else:
+			self.entries.clear()
+
+	def release(self):
+		self.entries.clear()
+		self.sub.cancel()
+
+	def report(self):
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"entries": len(self.entries)
+		}
+
+def cache(channel, ttl=None, size=1024):
+	uncache(channel)
+	caches[channel] = Cache(channel, ttl, size)
+	return caches[channel]
+
+def uncache(channel):
+	memo = caches.pop(channel, None)
+	if memo is not None:
+		memo.release()
+
+def listen(channel, cb, batch=False):
+	sub = Subscription(channel, cb, batch)
+	if isPattern(channel):
+		if channel not in patterns:
+			patterns[channel] = [compilePattern(channel), {}]
+			matches.clear()
+		patterns[channel][1][sub] = cb
+	else:
+		if channel not in listeners:
+			listeners[channel] = {}
+		listeners[channel][sub] = cb
+	return sub
+
+def unlisten(sub):
+	if isPattern(sub.channel):
+		subs = patterns.get(sub.channel)
+		subs = subs and subs[1]
 	else:
-		happenings[event].append([cb, args, kwargs])
+		subs = listeners.get(sub.channel)
+	if not subs or subs.pop(sub, None) is None:
+		return
+	if not subs:
+		if isPattern(sub.channel):
+			del patterns[sub.channel]
+			matches.clear()
+		else:
+			del listeners[sub.channel]
 
-def transpire(event):
-	if event in happenings:
-		if happenings[event] == "transpired":
+class Happenings(object):
+	def __init__(self, name=None, ttl=None, events=None):
+		self.name = name
+		self.ttl = ttl
+		self.events = {} if events is None else events
+		self.expirations = {}
+
+	def __repr__(self):
+		return '<Happenings Object | Namespace:"%s">'%(self.name,)
+
+	def when(self, event, cb, *args, **kwargs):
+		if event not in self.events:
+			self.events[event] = []
+		if self.events[event] == "transpired":
+			cb(*args, **kwargs)
+		else:
+			self.events[event].append([cb, args, kwargs])
+
+	def transpire(self, event, ttl=None, defer=False):
+		waiting = self.events.get(event)
+		if waiting == "transpired":
 			return
-		for cb, args, kwargs in happenings[event]:
+		self.events[event] = "transpired"
+		ttl = ttl or self.ttl
+		if ttl:
+			self.expire(event, ttl)
+		if waiting:
+			if defer:
+				from .rel import call_soon
+				call_soon(self.run, waiting)
+			else:
+				self.run(waiting)
+
+	def run(self, waiting):
+		for cb, args, kwargs in waiting:
 			cb(*args, **kwargs)
-	happenings[event] = "transpired"
\ No newline at end of file
+
+	def expire(self, event, ttl):
+		from .rel import timeout
+		timer = self.expirations.pop(event, None)
+		if timer is not None:
+			timer.delete()
+		self.expirations[event] = timeout(ttl, self.forget, event, slack=min(ttl, 1))
+
+	def forget(self, event):
+		self.events.pop(event, None)
+		timer = self.expirations.pop(event, None)
+		if timer is not None:
+			timer.delete()
+
+	def clear(self):
+		for timer in self.expirations.values():
+			timer.delete()
+		self.expirations.clear()
+		self.events.clear()
+
+happened = Happenings(events=happenings)
+
+def namespace(name, ttl=None):
+	if name not in namespaces:
+		namespaces[name] = Happenings(name, ttl)
+	return namespaces[name]
+
+def forgetNamespace(name):
+	ns = namespaces.pop(name, None)
+	if ns is not None:
+		ns.clear()
+
+def when(event, cb, *args, **kwargs):
+	happened.when(event, cb, *args, **kwargs)
+
+def transpire(event, ttl=None, defer=False):
+	happened.transpire(event, ttl, defer)
+
+def forget(event):
+	happened.forget(event)
@@ -1,10 +1,71 @@
 from _typeshed import Incomplete
 
 listeners: Incomplete
+patterns: Incomplete
+matches: Incomplete
+posts: Incomplete
+scheduled: Incomplete
+caches: Incomplete
+clock: Incomplete
 happenings: Incomplete
+namespaces: Incomplete
+MATCH_CACHE: int
 
+class Subscription:
+    channel: Incomplete
+    cb: Incomplete
+    batch: Incomplete
+    def __init__(self, channel, cb, batch: bool = ...) -> None: ...
+    def deliver(self, items) -> None: ...
+    def cancel(self) -> None: ...
+
+def isPattern(channel): ...
+def compilePattern(pattern): ...
+def subscribers(channel): ...
 def emit(channel, *args, **kwargs): ...
+def post(channel, *args, **kwargs) -> None: ...
+def flush() -> None: ...
 def ask(channel, *args, **kwargs): ...
-def listen(channel, cb) -> None: ...
+
+class Cache:
+    channel: Incomplete
+    ttl: Incomplete
+    size: Incomplete
+    entries: Incomplete
+    hits: int
+    misses: int
+    sub: Incomplete
+    def __init__(self, channel, ttl: Incomplete | None = ..., size: int = ...) -> None: ...
+    def key(self, args, kwargs): ...
+    def now(self): ...
+    def get(self, key): ...
+    def put(self, key, answer) -> None: ...
+    def invalidate(self, *args, **kwargs) -> None: ...
+    def release(self) -> None: ...
+    def report(self): ...
+
+def cache(channel, ttl: Incomplete | None = ..., size: int = ...): ...
+def uncache(channel) -> None: ...
+def listen(channel, cb, batch: bool = ...): ...
+def unlisten(sub) -> None: ...
+
+class Happenings:
+    name: Incomplete
+    ttl: Incomplete
+    events: Incomplete
+    expirations: Incomplete
+    def __init__(self, name: Incomplete | None = ..., ttl: Incomplete | None = ..., events: Incomplete | None = ...) -> None: ...
+    def when(self, event, cb, *args, **kwargs) -> None: ...
+    def transpire(self, event, ttl: Incomplete | None = ..., defer: bool = ...) -> None: ...
+    def run(self, waiting) -> None: ...
+    def expire(self, event, ttl) -> None: ...
+    def forget(self, event) -> None: ...
+    def clear(self) -> None: ...
+
+happened: Happenings
+
+def namespace(name, ttl: Incomplete | None = ...): ...
+def forgetNamespace(name) -> None: ...
 def when(event, cb, *args, **kwargs) -> None: ...
-def transpire(event) -> None: ...
+def transpire(event, ttl: Incomplete | None = ..., defer: bool = ...) -> None: ...
+def forget(event) -> None: ...
@@ -0,0 +1,83 @@
+"""
+This module contains the Wheel class, a coarse-grained timing wheel
+for tracking connection inactivity.
+
+### Wheel
+A Wheel divides its timeout into buckets of granularity seconds,
+driven by a single Timer. touch() moves a key into the bucket that
+expires timeout seconds from now, which is O(1) no matter how many
+keys are tracked, and each turn of the wheel expires a whole bucket
+in one batch. Expiry is coarse: a key idles between timeout and
+timeout + granularity seconds before its callback fires.
+
+    idle = rel.wheel(60)
+    idle.touch(conn, conn.close)  # on connect and on every activity
+    idle.remove(conn)             # on close
+
+SocketIO and Event objects can be attached to a Wheel with watch(),
+after which every dispatch counts as activity:
+
+    rel.read(sock, on_read).watch(idle, on_idle)
+"""
+
+from .util import Basic
+
+class Wheel(Basic):
+    def __init__(self, registrar, timeout, granularity=1):
+        self.registrar = registrar
+        self.timeout = timeout
+        self.granularity = granularity
+        self.span = max(1, int(-(-timeout // granularity))) + 1
+        self.buckets = [{} for i in range(self.span + 1)]
+        self.cursor = 0
+        self.where = {}
+        self.turning = False
+        self.timer = self.registrar.timeout(None, self.turn)
+        self.subname = "%ss/%ss"%(timeout, granularity)
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, key):
+        return key in self.where
+
+    def touch(self, key, cb=None, *args):
+        b = self.where.get(key)
+        if b is None:
+            if cb is None:
+                return self.log("touch: unknown key and no callback", key)
+            entry = (cb, args)
+        else:
+            entry = self.buckets[b].pop(key)
+            if cb is not None:
+                entry = (cb, args)
+        b = (self.cursor + self.span) % len(self.buckets)
+        self.buckets[b][key] = entry
+        self.where[key] = b
+        if not self.turning:
+            self.turning = True
+            self.timer.add(self.granularity)
+
+    def remove(self, key):
+        b = self.where.pop(key, None)
+        if b is not None:
+            del self.buckets[b][key]
+
+    def clear(self):
+        self.buckets = [{} for b in self.buckets]
+        self.where = {}
+        self.turning = False
+        self.timer.delete()
+
+    def turn(self):
+        self.cursor = (self.cursor + 1) % len(self.buckets)
+        expired = self.buckets[self.cursor]
+        if expired:
+            self.buckets[self.cursor] = {}
+            for key in expired:
+                del self.where[key]
+            self.log("expiring", len(expired))
+            for cb, args in expired.values():
+                cb(*args)
+        self.turning = bool(self.where)
+        return self.turning
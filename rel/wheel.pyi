@@ -0,0 +1,21 @@
+from .util import Basic as Basic
+from _typeshed import Incomplete
+
+class Wheel(Basic):
+    registrar: Incomplete
+    timeout: Incomplete
+    granularity: Incomplete
+    span: Incomplete
+    buckets: Incomplete
+    cursor: int
+    where: Incomplete
+    turning: bool
+    timer: Incomplete
+    subname: Incomplete
+    def __init__(self, registrar, timeout, granularity: int = ...) -> None: ...
+    def __len__(self) -> int: ...
+    def __contains__(self, key) -> bool: ...
+    def touch(self, key, cb: Incomplete | None = ..., *args) -> None: ...
+    def remove(self, key) -> None: ...
+    def clear(self) -> None: ...
+    def turn(self): ...
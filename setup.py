@@ -15,6 +15,7 @@ setup(
     entry_points = '''
         [console_scripts]
         rtimer = rel.tools:timerCLI
+        rtop = rel.tools:topCLI
     ''',
     classifiers = [
         'Development Status :: 5 - Production/Stable',